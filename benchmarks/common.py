@@ -0,0 +1,57 @@
+"""Timing, reporting and saving helpers shared by the benchmarks."""
+import gc
+import json
+import platform
+import subprocess
+import time
+
+def best_of(repeat: int, func, *args, setup=None):
+    """
+    Return (seconds of the fastest of repeat calls to func, what func returned).
+    If setup is given, it's called (untimed) before each call.
+    """
+    best = None
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            result = func(*args)
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+    finally:
+        gc.enable()
+    return best, result
+
+def commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def report(results: dict, metrics: list, baseline: dict = None) -> str:
+    """A table of metrics for each result, with the ratio to the baseline's, if any."""
+    lines = [f'{"":<22}' + ''.join(f'{m:>18}' for m in metrics)]
+    for name, result in results.items():
+        row = f'{name:<22}'
+        for metric in metrics:
+            value = result[metric]
+            cell = f'{value:.1f}' if isinstance(value, float) else str(value)
+            old = (baseline or {}).get(name, {}).get(metric)
+            if old:
+                cell += f' ({value / old:.2f}x)'
+            row += f'{cell:>18}'
+        lines.append(row)
+    return '\n'.join(lines)
+
+def load_results(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)['results']
+
+def save_results(path: str, results: dict, **details) -> None:
+    """Save results as JSON, with the commit, the Python version and any other details."""
+    with open(path, 'wt') as f:
+        json.dump({'commit': commit(), 'python': platform.python_version(), **details, 'results': results}, f, indent=2)
@@ -0,0 +1,170 @@
+"""
+Benchmarks module discovery and .iignore matching on a synthetic space built in
+a temp folder. The space has packages of modules, each with its own .iignore,
+an ignored node_modules folder that fans out into many subfolders, and a chain
+of nested folders for deep paths. It times Space.modules() (with and without the
+snapshot), Space.walk(), HierarchicalDotIIgnore.test_path(), canonical_path()
+and folders_back_to_root(), and counts the file system calls each one makes.
+Results go to stdout and, with --out, to a JSON file that a later run can
+--compare against.
+
+    python -m benchmarks.fs --packages 200 --out before.json
+    python -m benchmarks.fs --packages 200 --compare before.json
+"""
+import argparse
+import builtins
+import collections
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from intent.lang.parts import HierarchicalDotIIgnore, Space, canonical_path, reset_path_cache
+from intent.lang.parts.fs import folders_back_to_root
+
+from .common import best_of, load_results, report, save_results
+
+# Calls into the file system that are counted, as (module, name).
+SYSCALLS = [(os, 'scandir'), (os, 'stat'), (os, 'lstat'), (os, 'listdir'), (os, 'getcwd'), (builtins, 'open')]
+
+@contextlib.contextmanager
+def counting_syscalls():
+    """Count calls to the functions in SYSCALLS, by name, while in the with block."""
+    counts = collections.Counter()
+    originals = [(module, name, getattr(module, name)) for module, name in SYSCALLS]
+    def counted(name, func):
+        def wrapper(*args, **kwargs):
+            counts[name] += 1
+            return func(*args, **kwargs)
+        return wrapper
+    for module, name, func in originals:
+        setattr(module, name, counted(name, func))
+    try:
+        yield counts
+    finally:
+        for module, name, func in originals:
+            setattr(module, name, func)
+
+def write(path: str, text: str = '') -> None:
+    with open(path, 'wt') as f:
+        f.write(text)
+
+def build_space(root: str, packages: int, files: int, fanout: int, depth: int) -> Space:
+    """
+    Build a space in root. Each package has files modules, a .iignore, a generated
+    folder that it ignores, fanout node_modules subfolders (ignored by the root
+    .iignore), and a chain of depth nested folders with a module at the bottom.
+    """
+    space = Space.init(root)
+    with open(os.path.join(root, '.iignore'), 'at') as f:
+        f.write('node_modules/\n*.tmp\n')
+    for p in range(packages):
+        pkg = os.path.join(root, f'pkg{p}')
+        os.makedirs(os.path.join(pkg, 'generated'))
+        write(os.path.join(pkg, '.iignore'), 'generated/\n!keep.tmp\nscratch*.i\n')
+        for i in range(files):
+            write(os.path.join(pkg, f'm{i}.i'), f'name: m{i}\n')
+        write(os.path.join(pkg, 'scratch.i'), 'x: 1\n')
+        write(os.path.join(pkg, 'keep.tmp'))
+        write(os.path.join(pkg, 'drop.tmp'))
+        write(os.path.join(pkg, 'generated', 'g.i'), 'x: 1\n')
+        for n in range(fanout):
+            dep = os.path.join(pkg, 'node_modules', f'dep{n}')
+            os.makedirs(dep)
+            write(os.path.join(dep, 'index.i'), 'x: 1\n')
+        deep = os.path.join(pkg, *(f'd{d}' for d in range(depth)))
+        os.makedirs(deep)
+        write(os.path.join(deep, 'leaf.i'), 'x: 1\n')
+    # Old enough that the snapshot trusts the mtimes of the folders.
+    past = time.time() - 60
+    for folder, _, _ in os.walk(root):
+        os.utime(folder, (past, past))
+    return space
+
+def all_paths(root: str) -> list:
+    """Every file and folder in root, ignored or not."""
+    paths = []
+    for folder, dirs, files in os.walk(root):
+        paths.extend(os.path.join(folder, name) for name in dirs + files)
+    return paths
+
+def cold() -> None:
+    """Forget what a new process wouldn't know."""
+    reset_path_cache()
+    Space.forget_roots()
+
+def bench(root: str, repeat: int) -> dict:
+    paths = all_paths(root)
+    files = [path for path in paths if not os.path.isdir(path)]
+    # Prime the snapshot that modules(snapshot=True) reads.
+    primed = Space(root)
+    for _ in primed.modules(snapshot=True):
+        pass
+    primed.snapshot.save()
+
+    def modules(snapshot=False):
+        return sum(1 for _ in Space(root).modules(snapshot=snapshot))
+
+    def walk():
+        return sum(len(files) for _, _, files in Space(root).walk())
+
+    def test_path():
+        iignore = HierarchicalDotIIgnore(root)
+        return sum(1 for path in files if iignore.test_path(path) is True)
+
+    def canonical():
+        for path in paths:
+            canonical_path(path)
+        return len(paths)
+
+    def back_to_root():
+        return sum(1 for path in files for _ in folders_back_to_root(path))
+
+    cases = {
+        'modules': (modules, cold),
+        'modules_snapshot': (lambda: modules(snapshot=True), cold),
+        'walk': (walk, cold),
+        'test_path': (test_path, cold),
+        'canonical_path_cold': (canonical, reset_path_cache),
+        'canonical_path_warm': (canonical, None),
+        'folders_back_to_root': (back_to_root, None),
+    }
+    results = {}
+    for name, (func, setup) in cases.items():
+        seconds, count = best_of(repeat, func, setup=setup)
+        # Counted in a separate run, so the wrappers don't slow the timed ones.
+        if setup:
+            setup()
+        with counting_syscalls() as counts:
+            func()
+        results[name] = {'ms': seconds * 1000, 'items': count, 'syscalls': sum(counts.values()), 'by_call': dict(counts)}
+    return results
+
+METRICS = ['ms', 'items', 'syscalls']
+
+def main(argv=None):
+    syntax = argparse.ArgumentParser(prog='python -m benchmarks.fs', description='Benchmark module discovery and .iignore matching.')
+    syntax.add_argument('--packages', default=50, type=int, help='number of packages in the space')
+    syntax.add_argument('--files', default=20, type=int, help='modules per package')
+    syntax.add_argument('--fanout', default=100, type=int, help='node_modules subfolders per package')
+    syntax.add_argument('--depth', default=20, type=int, help='nested folders per package')
+    syntax.add_argument('--repeat', default=5, type=int, help='report the fastest of this many runs')
+    syntax.add_argument('--out', metavar='FILE', help='save results as JSON')
+    syntax.add_argument('--compare', metavar='FILE', help='show ratios to results saved earlier with --out')
+    args = syntax.parse_args(argv)
+    shape = dict(packages=args.packages, files=args.files, fanout=args.fanout, depth=args.depth)
+    root = tempfile.mkdtemp()
+    try:
+        build_space(root, **shape)
+        results = bench(root, args.repeat)
+    finally:
+        shutil.rmtree(root)
+        cold()
+    print(report(results, METRICS, load_results(args.compare) if args.compare else None))
+    if args.out:
+        save_results(args.out, results, shape=shape)
+
+if __name__ == '__main__':
+    sys.exit(main())
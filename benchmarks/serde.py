@@ -0,0 +1,126 @@
+"""
+Benchmarks the .i parser on synthetic documents that stress it along one axis
+each: deep nesting, wide dicts, long lists, heavy comments, and quoted values
+with escapes. For each document, it times load(), the code round trip (Dict.code
+and List.code), and Chunk construction for every line, and measures peak memory
+during load() with tracemalloc. Results go to stdout and, with --out, to a JSON
+file that a later run can --compare against.
+
+    python -m benchmarks.serde --out before.json
+    python -m benchmarks.serde --compare before.json
+"""
+import argparse
+import sys
+import tracemalloc
+
+from intent.lang.serde import load, Chunk
+
+from .common import best_of, load_results, report, save_results
+
+def deep(n: int) -> str:
+    """Dicts and lists nested n levels deep."""
+    lines = []
+    for level in range(n):
+        indent = '  ' * level
+        lines.append(f'{indent}-\n' if level % 2 else f'{indent}k{level}:\n')
+    lines.append('  ' * n + ('- leaf\n' if n % 2 else 'leaf: 1\n'))
+    return ''.join(lines)
+
+def wide(n: int) -> str:
+    """One dict with n keys."""
+    return ''.join(f'key{i}: value {i}\n' for i in range(n))
+
+def long(n: int) -> str:
+    """One list with n items."""
+    return 'items:\n' + ''.join(f'  - item {i}\n' for i in range(n))
+
+def comments(n: int) -> str:
+    """n entries, each with comment lines above it and a comment after it."""
+    return ''.join(f'# about key{i}\n#   more about it\n\nkey{i}: {i}  # trailing {i}\n' for i in range(n))
+
+def escapes(n: int) -> str:
+    """n quoted keys and values full of escapes."""
+    return ''.join(f'"k\\t{i}": "line\\n{i} \\"q\\" \\x3a \\u00e9 \\\\"\n' for i in range(n))
+
+# Name -> (generator, default size).
+DOCUMENTS = {
+    'deep': (deep, 300),
+    'wide': (wide, 20000),
+    'long': (long, 20000),
+    'comments': (comments, 10000),
+    'escapes': (escapes, 10000),
+}
+
+def make_chunks(lines: list) -> int:
+    """Build the Chunks that a parser would for lines. Returns how many."""
+    count = 0
+    for line in lines:
+        text_start = len(line) - len(line.lstrip(' '))
+        first = line[text_start:text_start + 1]
+        if first in ('', '#', '\n'):
+            continue
+        if first == '-':
+            value_start = text_start + 2
+            if line[value_start:].strip():
+                Chunk.from_source_value(Chunk.Mode.LIST_VALUE, line, 0, len(line) - 1, text_start=value_start)
+                count += 1
+            continue
+        colon = line.index(':', line.index('"', text_start + 1) if first == '"' else text_start)
+        Chunk.from_source_key(line, 0, colon + 1, text_start=text_start)
+        count += 1
+        if line[colon + 1:].strip():
+            Chunk.from_source_value(Chunk.Mode.DICT_VALUE, line, colon + 1, len(line) - 1)
+            count += 1
+    return count
+
+def peak_memory(func, *args) -> int:
+    """Peak bytes allocated while calling func."""
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def code_of(tree) -> str:
+    return tree.code
+
+def bench(name: str, size: int, repeat: int) -> dict:
+    generate, _ = DOCUMENTS[name]
+    doc = generate(size)
+    lines = doc.splitlines(keepends=True)
+    load_s, tree = best_of(repeat, load, doc)
+    code_s, code = best_of(repeat, code_of, tree)
+    if code != doc:
+        raise ValueError(f'{name}: code of loaded tree differs from document.')
+    chunks_s, chunks = best_of(repeat, make_chunks, lines)
+    return {
+        'size': size,
+        'bytes': len(doc),
+        'lines': len(lines),
+        'load_ms': load_s * 1000,
+        'code_ms': code_s * 1000,
+        'chunks': chunks,
+        'chunks_ms': chunks_s * 1000,
+        'load_peak_kib': peak_memory(load, doc) / 1024,
+    }
+
+METRICS = ['load_ms', 'code_ms', 'chunks_ms', 'load_peak_kib']
+
+def main(argv=None):
+    syntax = argparse.ArgumentParser(prog='python -m benchmarks.serde', description='Benchmark the .i parser.')
+    syntax.add_argument('--only', metavar='DOC', action='append', choices=list(DOCUMENTS), help='benchmark only this document (repeatable)')
+    syntax.add_argument('--scale', default=1.0, type=float, help='multiply the default size of each document by this')
+    syntax.add_argument('--repeat', default=5, type=int, help='report the fastest of this many runs')
+    syntax.add_argument('--out', metavar='FILE', help='save results as JSON')
+    syntax.add_argument('--compare', metavar='FILE', help='show ratios to results saved earlier with --out')
+    args = syntax.parse_args(argv)
+    results = {}
+    for name in args.only or DOCUMENTS:
+        results[name] = bench(name, max(1, int(DOCUMENTS[name][1] * args.scale)), args.repeat)
+    print(report(results, METRICS, load_results(args.compare) if args.compare else None))
+    if args.out:
+        save_results(args.out, results)
+
+if __name__ == '__main__':
+    sys.exit(main())
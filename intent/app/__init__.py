@@ -1,2 +1,8 @@
 from .main import main
-from .ui import ui
\ No newline at end of file
+
+def __getattr__(name):
+    # ui pulls in rich, so it's only imported when something asks for it.
+    if name == 'ui':
+        from .ui import ui
+        return ui
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
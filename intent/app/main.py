@@ -1,10 +1,12 @@
 import argparse
 import sys
+import time
 from typing import Callable
 
 from ..version import __version__
-from ..lang.parts.space import Space
-from .ui import ui, ArgparseFormatter
+
+# Commands import what they need (the parts package, the server, rich) when they
+# run, so a quick command like i root or i --version starts fast.
 
 __all__ = ['main']
 
@@ -14,6 +16,7 @@ class CmdlineSyntaxError(Exception):
 
 def root(args):
     """Report fq path to root of current space, if it's inited."""
+    from ..lang.parts.space import Space
     root = Space.find_root('.')
     if root:
         print(root)
@@ -24,9 +27,24 @@ def ignore(args):
 
 def compile(args):
     """Compile space, package, or module."""
+    from ..lang.parts.space import Space
+    from .serve import request
+    from .ui import ui
     for item in args.what:
         if item == "space":
-            print("compiling space")
+            root = Space.find_root('.')
+            if not root:
+                raise CmdlineSyntaxError('Not inside a space.')
+            # A running server has the space compiled already.
+            response = request(root, 'compile')
+            if response and response.get('ok'):
+                count, problems = response['modules'], response['problems']
+            else:
+                asts, problems = Space(root).compile(jobs=args.jobs, threads=args.threads)
+                count = len(asts)
+            for problem in problems:
+                ui.err(problem)
+            print(f"compiled {count} modules")
         elif item == "package":
             print("compiling package")
         elif item == "module":
@@ -34,39 +52,112 @@ def compile(args):
         else:
             print("nothing to compile")
 
+def serve(args):
+    """Keep the space compiled in memory, so other commands return fast."""
+    from ..lang.parts.space import Space
+    from .serve import Server
+    root = Space.find_root(args.where)
+    if not root:
+        raise CmdlineSyntaxError('Not inside a space.')
+    server = Server(root, polling=args.poll)
+    print(f"serving {root}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
 def init(args):
     """Init a space, or plug gaps in partly inited space."""
+    from ..lang.parts.space import Space
     Space.init(args.where, force=args.force)
 
 def help(args):
     """Show help for a command."""
-    syntax: argparse.ArgumentParser = globals().get(args.command + '_syntax')
+    syntax: argparse.ArgumentParser = command_syntax.get(args.command)
     if not syntax:
             raise CmdlineSyntaxError(f'Unrecognized command "{args.command}".')
     syntax.print_help()
 
-syntax = argparse.ArgumentParser(prog='i', description="Work with intent code.", add_help=False, formatter_class=ArgparseFormatter)
-syntax.add_argument('-h', '--help', '--H', '-?', action='help', default=argparse.SUPPRESS, help='Show this help message and exit.')
-syntax.add_argument('--verbose', '-v', action='store_true', help='Enable verbose mode.')
-commands = syntax.add_subparsers(dest='func', required=True, help="Commands")
+def run(func: Callable, args):
+    """Run a command, recording timings and a profile if the args ask for them."""
+    timings = profiler = None
+    if args.timings:
+        from ..lang.parts.timings import start_timings
+        timings = start_timings()
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    start = time.perf_counter()
+    try:
+        func(args)
+    finally:
+        elapsed = time.perf_counter() - start
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+        if timings:
+            from ..lang.parts.timings import stop_timings
+            stop_timings()
+            report = timings.report()
+            print((report + '\n' if report else '') + f'total {elapsed * 1000:.1f} ms', file=sys.stderr)
+
+class ArgumentParser(argparse.ArgumentParser):
+    """
+    Parses with argparse's plain formatter (argparse uses one even to add arguments),
+    and only imports rich_argparse when there's help or usage to show.
+    """
+    def format_usage(self):
+        self._use_rich()
+        return super().format_usage()
+
+    def format_help(self):
+        self._use_rich()
+        return super().format_help()
+
+    def _use_rich(self):
+        from .ui import ArgparseFormatter
+        self.formatter_class = ArgparseFormatter
+
+# Each command's parser, by command name.
+command_syntax = {}
 
 def child(commands, func: Callable):
-    return commands.add_parser(func.__name__, help=func.__doc__, formatter_class=ArgparseFormatter, add_help=False)
+    parser = commands.add_parser(func.__name__, help=func.__doc__, add_help=False)
+    command_syntax[func.__name__] = parser
+    return parser
+
+def build_syntax() -> argparse.ArgumentParser:
+    """Build the parser for the command line."""
+    syntax = ArgumentParser(prog='i', description="Work with intent code.", add_help=False)
+    syntax.add_argument('-h', '--help', '--H', '-?', action='help', default=argparse.SUPPRESS, help='Show this help message and exit.')
+    syntax.add_argument('--verbose', '-v', action='store_true', help='Enable verbose mode.')
+    syntax.add_argument('--timings', action='store_true', help='Report calls and time spent in each phase of work.')
+    syntax.add_argument('--profile', metavar='FILE', help='Profile the command with cProfile, and save stats to FILE for pstats.')
+    commands = syntax.add_subparsers(dest='func', required=True, help="Commands")
+
+    compile_syntax = child(commands, compile) #-----------------------------------
+    compile_syntax.add_argument('what', type=str, metavar='WHAT', nargs='*', help="space, package, or module")
+    compile_syntax.add_argument('--jobs', '-j', default=1, metavar='N', type=int, help="compile with N processes (0 = one per core)")
+    compile_syntax.add_argument('--threads', default=1, metavar='N', type=int, help="find modules with N threads (helps on network filesystems)")
+
+    init_syntax = child(commands, init) #-----------------------------------------
+    init_syntax.add_argument('where', default='.', metavar='PATH', type=str, nargs='?', help="existing folder to init as space")
+    init_syntax.add_argument('--force', action='store_true', help='Create even when location appears wrong.')
 
-compile_syntax = child(commands, compile) #-----------------------------------
-compile_syntax.add_argument('what', type=str, metavar='WHAT', nargs='*', help="space, package, or module")
+    root_syntax = child(commands, root) #-----------------------------------------
+    root_syntax.add_argument('where', default='.', metavar='PATH', type=str, nargs='?', help="file or folder inside the space")
 
-init_syntax = child(commands, init) #-----------------------------------------
-init_syntax.add_argument('where', default='.', metavar='PATH', type=str, nargs='?', help="existing folder to init as space")
-init_syntax.add_argument('--force', action='store_true', help='Create even when location appears wrong.')
+    serve_syntax = child(commands, serve) #---------------------------------------
+    serve_syntax.add_argument('where', default='.', metavar='PATH', type=str, nargs='?', help="file or folder inside the space")
+    serve_syntax.add_argument('--poll', action='store_true', help='Watch for changes by polling instead of with inotify.')
 
-root_syntax = child(commands, root) #-----------------------------------------
-root_syntax.add_argument('where', default='.', metavar='PATH', type=str, nargs='?', help="file or folder inside the space")
+    ignore_syntax = child(commands, ignore) #-------------------------------------
 
-ignore_syntax = child(commands, ignore) #-------------------------------------
+    help_syntax = child(commands, help) #-----------------------------------------
+    help_syntax.add_argument('command', type=str, metavar='CMD', nargs='?', help="which command")
 
-help_syntax = child(commands, help) #-----------------------------------------
-help_syntax.add_argument('command', type=str, metavar='CMD', nargs='?', help="which command")
+    return syntax
 
 def main():
     # First check for --version.
@@ -74,6 +165,7 @@ def main():
         print(__version__)
         return
     
+    syntax = build_syntax()
     show_syntax = False
     # Treat "i help" as a special case synonym for i --help.
     if len(sys.argv) == 2 and sys.argv[1] == 'help':
@@ -86,13 +178,15 @@ def main():
         func = globals().get(args.func)
         try:
             if func:
-                func(args)
+                run(func, args)
             else:
                 raise CmdlineSyntaxError(f'Unrecognized command "{args.func}".')
         except CmdlineSyntaxError as e:
+            from .ui import ui
             ui.err(e)
             show_syntax = True
         except Exception as e:
+            from .ui import ui
             ui.err(e)
 
     if show_syntax:
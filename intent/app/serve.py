@@ -0,0 +1,119 @@
+import json
+import os
+import selectors
+import socket
+from typing import Optional
+
+from ..lang.parts.watch import HotSpace
+
+__all__ = ['Server', 'request', 'socket_path']
+
+SOCKET_NAME = 'serve.sock'
+
+def socket_path(space_path: str) -> str:
+    """Where the server for a space listens."""
+    return os.path.join(space_path, 'out', SOCKET_NAME)
+
+def _read_line(conn: socket.socket) -> bytes:
+    chunks = []
+    while True:
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        if chunk.endswith(b'\n'):
+            break
+    return b''.join(chunks)
+
+def request(space_path: str, cmd: str, timeout: float = 30.0) -> Optional[dict]:
+    """
+    Send a command to the server for a space and return its response, or None if
+    no server is running there.
+    """
+    path = socket_path(space_path)
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(path):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(timeout)
+            conn.connect(path)
+            conn.sendall(json.dumps({'cmd': cmd}).encode('utf-8') + b'\n')
+            return json.loads(_read_line(conn))
+    except (OSError, ValueError):
+        return None
+
+class Server:
+    """
+    Keeps a space compiled in memory (see HotSpace) and answers commands on a unix
+    socket in the space's out/ folder, so CLI calls don't pay for a cold start.
+
+    The protocol is one line of JSON each way: the client sends {"cmd": ...} and
+    the server replies with a dict that has "ok" and, for "compile", "modules" (the
+    number of asts) and "problems". Commands are "compile", "ping" and "stop".
+    """
+    def __init__(self, space_path: str, polling: bool = False, poll_interval: float = 1.0):
+        if not hasattr(socket, 'AF_UNIX'):
+            raise ValueError('Serving needs unix sockets, which this platform lacks.')
+        self.path = socket_path(space_path)
+        if request(space_path, 'ping', timeout=2.0):
+            raise ValueError(f'A server is already running for {space_path}.')
+        self.hot = HotSpace(space_path, polling)
+        self.poll_interval = poll_interval
+        self.stopping = False
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if os.path.exists(self.path):
+            os.remove(self.path)  # left behind by a server that died
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(self.path)
+        self.listener.listen()
+
+    def handle(self, req: dict) -> dict:
+        cmd = req.get('cmd')
+        if cmd == 'compile':
+            asts, problems = self.hot.compile()
+            return {'ok': True, 'modules': len(asts), 'problems': problems}
+        if cmd == 'ping':
+            return {'ok': True}
+        if cmd == 'stop':
+            self.stopping = True
+            return {'ok': True}
+        return {'ok': False, 'error': f'Unrecognized command "{cmd}".'}
+
+    def _serve_one(self) -> None:
+        conn, _ = self.listener.accept()
+        with conn:
+            try:
+                response = self.handle(json.loads(_read_line(conn)))
+            except Exception as e:
+                # A bad request or a failed compile shouldn't take the server down.
+                response = {'ok': False, 'error': str(e)}
+            conn.sendall(json.dumps(response).encode('utf-8') + b'\n')
+
+    def serve_forever(self) -> None:
+        with selectors.DefaultSelector() as sel:
+            sel.register(self.listener, selectors.EVENT_READ, 'accept')
+            watch_fd = None
+            try:
+                while not self.stopping:
+                    # An update can replace the watcher, so check which fd to wait on.
+                    fd = self.hot.watcher.fileno()
+                    if fd != watch_fd:
+                        if watch_fd is not None:
+                            sel.unregister(watch_fd)
+                        if fd is not None:
+                            sel.register(fd, selectors.EVENT_READ, 'watch')
+                        watch_fd = fd
+                    # Without a watcher fd to wait on, wake up now and then to poll for changes.
+                    events = sel.select(None if watch_fd is not None else self.poll_interval)
+                    if not events or any(key.data == 'watch' for key, _ in events):
+                        self.hot.update()
+                    if any(key.data == 'accept' for key, _ in events):
+                        self._serve_one()
+            finally:
+                self.close()
+
+    def close(self) -> None:
+        self.listener.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.hot.close()
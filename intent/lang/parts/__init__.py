@@ -1,4 +1,4 @@
 from .space import Space
 from .module import Module
 from .iignore import HierarchicalDotIIgnore, DOT_IGNORE_NAME
-from .fs import canonical_path, enforced_canonical_folder
\ No newline at end of file
+from .fs import canonical_path, enforced_canonical_folder, join_canonical, relative_canonical, reset_path_cache
\ No newline at end of file
@@ -1,16 +1,63 @@
+import functools
 import os
-from typing import Generator
+import time
+from typing import Callable, Generator, IO
 
+# A file or folder modified this recently could change again within the same
+# mtime tick without its mtime changing, so an mtime this fresh isn't trusted.
+RACY_SECONDS = 2
+
+# The working folder, captured the first time a relative path is canonicalized.
+_cwd = None
+
+@functools.lru_cache(maxsize=1 << 16)
 def canonical_path(path: str) -> str:
     """
     Expands references to user's home dir, converts relative to absolute,
     normalizes separators to os.path.sep, removes redundant and trailing
     separators. This means that folders are returned without a trailing
     slash. Does not resolve symlinks. 
+
+    Results are memoized, and relative paths are resolved against the working
+    folder as it was the first time one was seen; call reset_path_cache after
+    changing folders.
     """
+    global _cwd
     if path.startswith('~'):
         path = os.path.expanduser(path)
-    return os.path.abspath(os.path.normpath(path))
+    if not os.path.isabs(path):
+        if _cwd is None:
+            _cwd = os.getcwd()
+        path = os.path.join(_cwd, path)
+    return os.path.normpath(path)
+
+def reset_path_cache() -> None:
+    """Forget memoized canonical paths and the captured working folder."""
+    global _cwd
+    _cwd = None
+    canonical_path.cache_clear()
+
+def join_canonical(folder: str, name: str) -> str:
+    """
+    Join a canonical folder and a plain name (no separators, not . or ..) into a
+    canonical path, without any of the work canonical_path does.
+    """
+    if folder.endswith(os.sep):
+        return folder + name
+    return folder + os.sep + name
+
+def relative_canonical(path: str, folder: str) -> str:
+    """
+    The part of a canonical path below a canonical folder, with no leading
+    separator, or '.' for the folder itself. Like os.path.relpath, but only
+    string slicing; the path must be the folder or inside it.
+    """
+    if path == folder:
+        return '.'
+    prefix = folder if folder.endswith(os.sep) else folder + os.sep
+    if not path.startswith(prefix):
+        raise ValueError(f'{path} is not inside {folder}')
+    return path[len(prefix):]
 
 def enforced_canonical_folder(path: str) -> str:
     """
@@ -21,6 +68,8 @@ def enforced_canonical_folder(path: str) -> str:
     folder or a link to a folder, this function raises a ValueError.
     """
     path = canonical_path(path)
+    if os.path.isdir(path):
+        return path
     # Find the longest subset of the path that points to something
     # that already exists.
     subset = path
@@ -52,3 +101,21 @@ def folders_back_to_root(path: str) -> Generator[str, None, None]:
             break
         path = parent
 
+
+def trusted_mtime_ns(mtime_ns: int) -> int:
+    """Return mtime_ns, or 0 (which never matches a real mtime) if it's too recent to trust."""
+    if time.time_ns() - mtime_ns < RACY_SECONDS * 1_000_000_000:
+        return 0
+    return mtime_ns
+
+def atomic_write(path: str, write: Callable[[IO[bytes]], None]) -> None:
+    """
+    Write a file by calling write on a binary temp file next to it, then renaming
+    the temp file over path, so a reader never sees half a file. Creates the
+    folder if needed.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        write(f)
+    os.replace(tmp, path)
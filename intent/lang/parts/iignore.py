@@ -1,8 +1,8 @@
 import os
-from typing import Optional
-import pathspec
+import re
+from typing import Iterable, Iterator, NamedTuple, Optional, Tuple
 
-from .fs import canonical_path, enforced_canonical_folder
+from .fs import canonical_path, enforced_canonical_folder, join_canonical
 
 DOT_IGNORE_NAME = '.iignore'
 
@@ -108,21 +108,147 @@ lcov-report/
 DEFAULT_IIGNORE = DEFAULT_IIGNORE_HEADER + DEFAULT_IGNORE_PATS
 DEFAULT_GITIGNORE = DEFAULT_IGNORE_PATS
 
-def normalize_path_for_git(fpath:str) -> str:
-	"""
-	Roughly, a copy of the normalize_file function in util.py in pathspec.
-    We copy it because we need to call it directly, in our test_path() func
-    that basically overrides GitIgnoreSpec.match_file(). Unfortunately, this
-    function isn't exposed for import by the pathspace library. We can actually
-    simplify it anyway; we know what separator is going to be present in our paths.
-	"""
-	norm_file = fpath.replace(os.path.sep, '/')
-	if norm_file.startswith('/'):
-		norm_file = norm_file[1:]
-	elif norm_file.startswith('./'):
-		norm_file = norm_file[2:]
-	return norm_file
-    
+LITERAL_EXCLUDES = frozenset('*?[]\\/')
+
+class Rule(NamedTuple):
+    """One pattern from a .iignore file."""
+    # NAME, DIR_NAME or SUFFIX (matched by looking the item's name up in a dict),
+    # or REGEX (matched against the path relative to the declaring folder).
+    kind: str
+    # The name or suffix for dict lookups, or the compiled regex.
+    key: object
+    # True for a normal pattern, False for a negated one.
+    ignore: bool
+
+NAME, DIR_NAME, SUFFIX, REGEX = 'name', 'dir_name', 'suffix', 'regex'
+
+def _is_literal(txt: str) -> bool:
+    return bool(txt) and not any(c in LITERAL_EXCLUDES for c in txt)
+
+def parse_rule(line: str) -> Optional[Rule]:
+    """
+    Parse a line of a .iignore file, or return None for blanks and comments. Names
+    (node_modules/, Thumbs.db) and suffixes (*.log) become rules that can be matched
+    with a dict lookup; anything else gets the regex pathspec would use.
+    """
+    # pathspec is imported on first use, so commands that never read a .iignore
+    # don't pay for it.
+    from pathspec.patterns.gitwildmatch import GitWildMatchPattern
+    line = line.rstrip('\r\n')
+    pattern = GitWildMatchPattern(line)
+    if pattern.include is None:
+        return None
+    txt = line[1:] if line.startswith('!') else line
+    if txt == txt.strip() and not txt.startswith('#'):
+        dir_only = txt.endswith('/')
+        if dir_only:
+            txt = txt[:-1]
+        if _is_literal(txt):
+            return Rule(DIR_NAME if dir_only else NAME, txt, pattern.include)
+        if not dir_only and txt.startswith('*') and _is_literal(txt[1:]):
+            return Rule(SUFFIX, txt[1:], pattern.include)
+    return Rule(REGEX, re.compile(_item_only(pattern.regex.pattern).replace('(?P<ps_d>', '(?:')), pattern.include)
+
+def _item_only(regex: str) -> str:
+    """
+    Drop the tail that pathspec adds to a pattern's regex so it also matches
+    everything inside a matching folder. Like git, items are matched on their own,
+    and being inside an ignored folder is handled by checking the folders first.
+    """
+    for tail, replacement in (('(?:(?P<ps_d>/).*)?$', '/?$'), ('(?P<ps_d>/).*$', '/$')):
+        if regex.endswith(tail):
+            return regex[:-len(tail)] + replacement
+    return regex
+
+class Matcher:
+    """
+    The rules from one or more .iignore files, merged into one set of lookups. Each
+    rule gets a number, and when several rules match an item, the highest numbered
+    one decides. Rules are numbered in file order, and a folder's rules are numbered
+    after those of the folders above it, so this gives the same answer as checking
+    each file, nearest first, and letting the last matching pattern in it decide.
+    """
+    __slots__ = ('names', 'dir_names', 'suffixes', 'suffix_lens', 'regex_groups', 'size')
+
+    def __init__(self):
+        self.names = {}      # name -> (number, ignore)
+        self.dir_names = {}  # name -> (number, ignore)
+        self.suffixes = {}   # suffix -> (number, ignore)
+        self.suffix_lens = ()
+        # One entry per folder with regex rules, nearest first: (highest number, offset of
+        # the path relative to the folder, one regex with an alternative per rule, and
+        # {alternative's group name: (number, ignore)}). Alternatives are in descending
+        # number order, so the first one that matches is the one that decides.
+        self.regex_groups = []
+        self.size = 0
+
+    def extend(self, folder: str, rules) -> 'Matcher':
+        """Return a new Matcher with rules declared in folder added after these."""
+        m = Matcher()
+        m.names, m.dir_names, m.suffixes = dict(self.names), dict(self.dir_names), dict(self.suffixes)
+        n = self.size
+        regexes = []
+        for rule in rules:
+            if rule.kind == NAME:
+                m.names[rule.key] = (n, rule.ignore)
+            elif rule.kind == DIR_NAME:
+                m.dir_names[rule.key] = (n, rule.ignore)
+            elif rule.kind == SUFFIX:
+                m.suffixes[rule.key] = (n, rule.ignore)
+            else:
+                regexes.append((n, rule.key.pattern, rule.ignore))
+            n += 1
+        m.size = n
+        m.suffix_lens = tuple(sorted({len(suffix) for suffix in m.suffixes}))
+        m.regex_groups = self.regex_groups
+        if regexes:
+            regexes.reverse()
+            offset = len(folder) if folder.endswith(os.sep) else len(folder) + 1
+            combined = re.compile('|'.join(f'(?P<r{number}>{regex})' for number, regex, _ in regexes))
+            outcomes = {f'r{number}': (number, ignore) for number, _, ignore in regexes}
+            m.regex_groups = [(regexes[0][0], offset, combined, outcomes)] + self.regex_groups
+        return m
+
+    def test(self, path: str, is_dir: bool = False) -> Optional[bool]:
+        """
+        Test a canonical path. Returns True if it's ignored, False if a negated pattern
+        includes it, or None if no pattern matches it. Only the item itself is tested;
+        checking the folders above it is up to the caller.
+        """
+        name = path[path.rfind(os.sep) + 1:]
+        best, result = -1, None
+        hit = self.names.get(name)
+        if hit:
+            best, result = hit
+        if is_dir:
+            hit = self.dir_names.get(name)
+            if hit and hit[0] > best:
+                best, result = hit
+        if self.suffixes:
+            for n in self.suffix_lens:
+                if n > len(name):
+                    break
+                hit = self.suffixes.get(name[-n:])
+                if hit and hit[0] > best:
+                    best, result = hit
+        for top, offset, regex, outcomes in self.regex_groups:
+            if top <= best:
+                break
+            rel = path[offset:]
+            if os.sep != '/':
+                rel = rel.replace(os.sep, '/')
+            if is_dir:
+                rel += '/'
+            match = regex.match(rel)
+            if match:
+                number, ignore = outcomes[match.lastgroup]
+                if number > best:
+                    return ignore
+                break
+        return result
+
+EMPTY_MATCHER = Matcher()
+
 class DotIIgnore:
     """
     Provide support for .iignore files, more or less paralleling the
@@ -130,17 +256,62 @@ class DotIIgnore:
     """
     def __init__(self, path: str):
         self.path: str = canonical_path(path)
-        self._spec: Optional[pathspec.GitIgnoreSpec] = None
-        self._mtime = None
+        self.folder: str = os.path.dirname(self.path)
+        self._spec = None
+        self._lines = None
+        self._rules = None
+        self._matcher = None
+        self._stamp = None
 
     @property
-    def spec(self) -> pathspec.GitIgnoreSpec:
-        current_mtime = os.path.getmtime(self.path)
-        if self._spec is None or self._mtime < current_mtime:
-            with open(self.path, 'r') as f:
-                self._spec = pathspec.GitIgnoreSpec.from_lines(f)
-            self._mtime = current_mtime
+    def spec(self) -> 'pathspec.GitIgnoreSpec':
+        """
+        The patterns as a pathspec GitIgnoreSpec, built the first time it's asked
+        for. Matching doesn't need it; it uses rules. They're read once; call
+        refresh() to pick up changes to the file.
+        """
+        if self._spec is None:
+            import pathspec
+            if self._lines is None:
+                self._load()
+            self._spec = pathspec.GitIgnoreSpec.from_lines(self._lines)
         return self._spec
+
+    @property
+    def rules(self) -> list:
+        """The patterns as Rules, in file order."""
+        if self._rules is None:
+            self._load()
+        return self._rules
+
+    @property
+    def stamp(self) -> tuple:
+        """(mtime_ns, size) of the file when its patterns were read."""
+        if self._rules is None:
+            self._load()
+        return self._stamp
+
+    def _load(self) -> None:
+        st = os.stat(self.path)
+        self._stamp = (st.st_mtime_ns, st.st_size)
+        with open(self.path, 'r') as f:
+            self._lines = f.readlines()
+        self._spec = None
+        self._rules = [rule for rule in map(parse_rule, self._lines) if rule]
+        self._matcher = None
+
+    def refresh(self) -> bool:
+        """Reload the patterns if the file changed since they were read. Returns True if it did."""
+        if self._lines is None:
+            return False
+        try:
+            st = os.stat(self.path)
+            changed = (st.st_mtime_ns, st.st_size) != self._stamp
+        except OSError:
+            changed = True
+        if changed:
+            self._spec = self._lines = self._rules = self._matcher = None
+        return changed
     
     def test_path(self, path: str) -> Optional[bool]:
         """
@@ -149,68 +320,178 @@ class DotIIgnore:
         False if it should be affirmatively included because it matches a negated pattern
         (e.g., !*.txt), or None if the file doesn't match a pattern at all (meaning it
         will be False unless we find an affirmative match in another DotIIgnore at a
-        higher level in the directory tree.
+        higher level in the directory tree. Like git, patterns are matched against the
+        path relative to the folder holding the .iignore, and anything inside an ignored
+        folder is ignored.
         """
-        std_path = normalize_path_for_git(path)
-        match, _index = self.spec._match_file(enumerate(self.spec.patterns), std_path)
-        return match
+        if self._matcher is None:
+            self._matcher = EMPTY_MATCHER.extend(self.folder, self.rules)
+        path = canonical_path(path)
+        folder = self.folder
+        for i in range(len(folder) + 1, len(path)):
+            if path[i] == os.sep and self._matcher.test(path[:i], True) is True:
+                return True
+        return self._matcher.test(path)
     
+class FolderState(NamedTuple):
+    # The DotIIgnores that govern items in the folder, nearest first.
+    chain: tuple
+    # Whether the folder, or one of the folders above it, is ignored.
+    ignored: bool
+    # The rules of the whole chain, merged.
+    matcher: Matcher
+
 class HierarchicalDotIIgnore:
     def __init__(self, root: str):
         self.root = enforced_canonical_folder(root)
-        self._iignores = None # lazy init
+        self._found = {} # folder -> DotIIgnore, or None if the folder has no .iignore
+        self._folders = {} # folder -> FolderState, or None if outside root
+        self._prefix = self.root if self.root.endswith(os.sep) else self.root + os.sep
 
     @property
     def iignores(self):
         """
-        Returns a dictionary of DotIgnore objects, keyed by the directory they're in.
+        Returns a dictionary of DotIgnore objects, keyed by the directory they're in,
+        for the whole tree under root. This visits every folder; testing paths doesn't
+        need it, because .iignore files are looked for lazily, one folder at a time.
+        """
+        stack = [self.root]
+        while stack:
+            folder = stack.pop()
+            self.iignore_in(folder)
+            try:
+                with os.scandir(folder) as it:
+                    stack.extend(e.path for e in it if e.is_dir(follow_symlinks=False))
+            except OSError:
+                pass
+        return {folder: iignore for folder, iignore in self._found.items() if iignore}
+
+    def iignore_in(self, folder: str) -> Optional[DotIIgnore]:
+        """
+        Return the DotIIgnore for the .iignore in a canonical folder, or None if there
+        isn't one. Both answers are cached, so each folder is checked once (until
+        refresh(rediscover=True)). Unless learn() was told, checking costs a stat.
+        """
+        try:
+            return self._found[folder]
+        except KeyError:
+            pass
+        path = join_canonical(folder, DOT_IGNORE_NAME)
+        iignore = self._found[folder] = DotIIgnore(path) if os.path.isfile(path) else None
+        return iignore
+
+    def learn(self, folder: str, has_iignore: bool) -> None:
+        """
+        Record whether a canonical folder has a .iignore, for a caller that just
+        listed it, so iignore_in doesn't have to check again.
         """
-        if self._iignores is None:
-            self._iignores = {}
-            for root, _, files in os.walk(self.root):
-                if DOT_IGNORE_NAME in files:
-                    path = os.path.join(root, DOT_IGNORE_NAME)
-                    self._iignores[root] = DotIIgnore(path)
-        return self._iignores
+        if folder not in self._found:
+            self._found[folder] = DotIIgnore(join_canonical(folder, DOT_IGNORE_NAME)) if has_iignore else None
+
+    def refresh(self, rediscover: bool = False) -> None:
+        """
+        Forget cached decisions if any .iignore changed since it was read. Decisions
+        are otherwise never rechecked, so call this once per walk (or per batch of
+        tests), not once per path. If rediscover is True, also forget which folders
+        have .iignore files, in case some were added or removed.
+        """
+        if rediscover:
+            self._found.clear()
+            self._folders.clear()
+            return
+        changed = False
+        for folder, iignore in list(self._found.items()):
+            if iignore and iignore.refresh():
+                changed = True
+                if not os.path.isfile(iignore.path):
+                    self._found[folder] = None
+        if changed:
+            self._folders.clear()
+
+    def folder_state(self, folder: str) -> Optional[FolderState]:
+        """
+        Return the governing chain and ignored status of a canonical folder, or None
+        if it isn't within root. Cached per folder, and built from the parent's state,
+        so an ignored folder makes its whole subtree ignored without further matching.
+        """
+        try:
+            return self._folders[folder]
+        except KeyError:
+            pass
+        state = None
+        if folder == self.root:
+            state = FolderState((), False, EMPTY_MATCHER)
+        elif folder.startswith(self._prefix):
+            parent = self.folder_state(os.path.dirname(folder))
+            ignored = parent.ignored or parent.matcher.test(folder, True) is True
+            state = FolderState(parent.chain, ignored, parent.matcher)
+        # Everything in an ignored folder is ignored, so its own rules don't matter.
+        if state is not None and not state.ignored:
+            iignore = self.iignore_in(folder)
+            if iignore:
+                state = FolderState((iignore,) + state.chain, False, state.matcher.extend(folder, iignore.rules))
+        self._folders[folder] = state
+        return state
+
+    def is_ignored_folder(self, folder: str) -> bool:
+        """Whether everything in a folder is ignored, so a walk can skip it entirely."""
+        state = self.folder_state(canonical_path(folder))
+        return state is not None and state.ignored
     
     def test_path(self, path)-> Optional[bool]:
         """
         Decide if a path matches one of the defined pattern or not. Returns True
-        if the path should be ignored because it matches a normal pattern (e.g., *.txt),
-        False if it should be affirmatively included because it matches a negated pattern
-        (e.g., !*.txt), or None if the file doesn't match a pattern at all (meaning it
-        will be False unless we find an affirmative match in another DotIIgnore at a
-        higher level in the directory tree.
+        if the path should be ignored because it matches a normal pattern (e.g., *.txt)
+        or is inside an ignored folder, False if it should be affirmatively included
+        because it matches a negated pattern (e.g., !*.txt), or None if the file doesn't
+        match a pattern at all (meaning it will be False unless we find an affirmative
+        match in another DotIIgnore at a higher level in the directory tree.
         """
-        if not self.iignores:
-            return False
         path = canonical_path(path)
-        if os.path.commonpath([path, self.root]) != self.root:
+        state = self.folder_state(os.path.dirname(path))
+        if state is None:
             return False
-        min_len = len(self.root)
-        current = path
-        while len(path) > min_len:
-            iignore = self._find_governing_iignore(current)
-            if not iignore:
-                break
-            result = iignore.test_path(path)
-            if result is not None:
-                return result
-            current = os.path.dirname(iignore.path)
-        return None
-    
-    def _find_governing_iignore(self, path):
-        # It only makes sense to attempt matches if the path is within the root.
-        try:
-            if os.path.commonpath([path, self.root]) == self.root:
-                min_len = len(self.root)
-                while len(path) > min_len:
-                    parent = os.path.dirname(path)
-                    di = self.iignores.get(parent)
-                    if di: 
-                        return di
-                    path = parent
-        except ValueError: 
-            pass # Paths are a mixture of relative and absolute, or are on different drives.
-        return None
+        return self.test_in_folder(state, path)
+
+    def test_paths(self, paths: Iterable[str]) -> Iterator[Tuple[str, Optional[bool]]]:
+        """
+        Test many paths, yielding (path, result) for each, in order, where result is
+        what test_path would return. Paths are grouped by the folder they name, and
+        each folder is canonicalized and looked up once, so classifying a long list
+        (e.g., the output of git ls-files) costs little more than one match per path.
+        """
+        folders = {}  # folder as given -> canonical folder and its state
+        for path in paths:
+            head, sep, name = path.rpartition(os.sep)
+            if name in ('', '.', '..'):
+                yield path, self.test_path(path)
+                continue
+            if not head:
+                head = sep or '.'
+            try:
+                folder, state = folders[head]
+            except KeyError:
+                folder = canonical_path(head)
+                state = self.folder_state(folder)
+                folders[head] = folder, state
+            if state is None:
+                yield path, False
+            else:
+                yield path, self.test_in_folder(state, join_canonical(folder, name))
+
+    def filter_paths(self, paths: Iterable[str]) -> Iterator[str]:
+        """Yield the paths that aren't ignored, in order."""
+        for path, result in self.test_paths(paths):
+            if result is not True:
+                yield path
 
+    def test_in_folder(self, state: FolderState, path: str, is_dir: bool = False) -> Optional[bool]:
+        """
+        Like test_path, for a canonical path whose folder's state the caller already
+        has (e.g., a walker testing each item in a folder). For a subfolder (is_dir),
+        True means the same as folder_state(path).ignored, but the subfolder's own
+        .iignore isn't looked for.
+        """
+        if state.ignored:
+            return True
+        return state.matcher.test(path, is_dir)
@@ -0,0 +1,53 @@
+import marshal
+import os
+from typing import NamedTuple, Optional
+
+from .fs import atomic_write
+
+class ManifestEntry(NamedTuple):
+    mtime_ns: int
+    size: int
+    digest: str
+    # (folder, mtime_ns, size) of each .iignore that governs the module.
+    iignores: tuple
+    problem: Optional[str]
+
+class CompileManifest:
+    """
+    Records what the last compile of a space saw and produced for each module:
+    its mtime, size and content hash, the .iignore files governing it, and any
+    problem compiling it. A module whose file and governing .iignores still match
+    its entry doesn't need to be compiled again.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._entries = None
+
+    @property
+    def entries(self) -> dict:
+        if self._entries is None:
+            try:
+                with open(self.path, 'rb') as f:
+                    self._entries = {path: ManifestEntry(*entry) for path, entry in marshal.load(f).items()}
+            except (OSError, EOFError, ValueError, TypeError):
+                self._entries = {}
+        return self._entries
+
+    def lookup(self, path: str, iignores: tuple) -> Optional[ManifestEntry]:
+        """Return the entry for path, if it's still valid."""
+        entry = self.entries.get(path)
+        if entry is None or entry.iignores != iignores:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if entry.mtime_ns != st.st_mtime_ns or entry.size != st.st_size:
+            return None
+        return entry
+
+    def save(self, entries: dict) -> None:
+        """Replace all entries, and persist them."""
+        self._entries = entries
+        data = {path: tuple(entry) for path, entry in entries.items()}
+        atomic_write(self.path, lambda f: marshal.dump(data, f))
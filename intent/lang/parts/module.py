@@ -2,6 +2,12 @@ import os
 import weakref
 
 from .fs import canonical_path
+from ..serde import load
+from .timings import timed
+
+def _read(path: str) -> str:
+    with open(path, 'rt', encoding='utf-8') as f:
+        return f.read()
 
 class Module:
     def __init__(self, path, space=None):
@@ -25,5 +31,16 @@ class Module:
         return s.abs_path_to_rel(self.path)[:-2] if s else None
     
     def compile(self):
-        ast = {}
+        """
+        Parse the module. Returns (ast, None), or (None, problem) if it can't be parsed.
+        Trees are reused from the space's parse cache when the file hasn't changed.
+        """
+        s = self.space
+        try:
+            if s:
+                ast = s.parse_cache.load(self.path)
+            else:
+                ast = timed('parse', load)(timed('read', _read)(self.path))
+        except (OSError, UnicodeDecodeError, ValueError) as e:
+            return None, f'{self.path}: {e}'
         return ast, None
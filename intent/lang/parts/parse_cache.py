@@ -0,0 +1,104 @@
+import hashlib
+import marshal
+import os
+import pickle
+
+from ..serde import load, PARSER_VERSION
+from .fs import atomic_write, trusted_mtime_ns
+from .timings import timed
+
+INDEX_NAME = 'index'
+
+def stamp_of(st: os.stat_result, digest: str) -> tuple:
+    """
+    Return (mtime_ns, size, digest) for a file. The mtime is 0 (so it never matches)
+    if the file was modified too recently to trust it.
+    """
+    return (trusted_mtime_ns(st.st_mtime_ns), st.st_size, digest)
+
+def _read(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+class ParseCache:
+    """
+    Keeps the trees that load() builds for .i files in a folder on disk, so unchanged
+    files don't have to be parsed again. Trees are stored under a hash of the file's
+    content plus PARSER_VERSION. An index remembers the size and mtime each file had
+    when it was last hashed; while those still match, the file isn't even read.
+    """
+    def __init__(self, folder: str):
+        self.folder = folder
+        self._index = None
+        self._dirty = False
+
+    @property
+    def index(self) -> dict:
+        """Maps a path to the (mtime_ns, size, digest) it had when it was last hashed."""
+        if self._index is None:
+            try:
+                with open(os.path.join(self.folder, INDEX_NAME), 'rb') as f:
+                    self._index = marshal.load(f)
+            except (OSError, EOFError, ValueError, TypeError):
+                self._index = {}
+        return self._index
+
+    @staticmethod
+    def digest(content: bytes) -> str:
+        h = hashlib.blake2b(content, digest_size=20)
+        h.update(b'\0parser %d' % PARSER_VERSION)
+        return h.hexdigest()
+
+    def _entry_path(self, digest: str) -> str:
+        return os.path.join(self.folder, digest[:2], digest)
+
+    def tree(self, digest: str):
+        """Return the cached tree for a digest, or None if there isn't a usable one."""
+        try:
+            with open(self._entry_path(digest), 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            # A missing, partial or corrupt entry is just a miss; it gets overwritten.
+            return None
+
+    def _write_entry(self, digest: str, tree) -> None:
+        atomic_write(self._entry_path(digest), lambda f: pickle.dump(tree, f, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def load(self, path: str):
+        """
+        Return the same tree as load() on the text of the file at path, reusing a
+        cached tree when the file hasn't changed.
+        """
+        st = os.stat(path)
+        stamp = self.index.get(path)
+        tried = None
+        if stamp and stamp[0] == st.st_mtime_ns and stamp[1] == st.st_size:
+            tried = stamp[2]
+            tree = self.tree(tried)
+            if tree is not None:
+                return tree
+        content = timed('read', _read)(path)
+        digest = self.digest(content)
+        # Record the stamp before parsing, so the digest of a file that fails to
+        # parse is known too.
+        self.index[path] = stamp_of(st, digest)
+        self._dirty = True
+        # The file may have been touched without changing, or changed back.
+        tree = self.tree(digest) if digest != tried else None
+        if tree is None:
+            tree = timed('parse', load)(content.decode('utf-8'))
+            self._write_entry(digest, tree)
+        return tree
+
+    def merge(self, stamps: dict) -> None:
+        """Adopt index entries recorded by another ParseCache on the same folder (e.g., in a worker process)."""
+        if stamps:
+            self.index.update(stamps)
+            self._dirty = True
+
+    def save(self) -> None:
+        """Persist the index, if it changed."""
+        if not self._dirty:
+            return
+        atomic_write(os.path.join(self.folder, INDEX_NAME), lambda f: marshal.dump(self.index, f))
+        self._dirty = False
@@ -0,0 +1,89 @@
+import marshal
+import os
+from typing import NamedTuple, Optional
+
+from .fs import atomic_write, trusted_mtime_ns
+from .iignore import DOT_IGNORE_NAME
+
+class Listing(NamedTuple):
+    # Names of the subfolders to descend into (not symlinks), sorted.
+    dirs: tuple
+    # Names of the .i files, sorted.
+    modules: tuple
+    # Whether the folder has a .iignore.
+    has_iignore: bool
+
+def list_folder(folder: str) -> Optional[Listing]:
+    """List what module discovery needs to know about a folder, or None if it can't be read."""
+    dirs, modules, has_iignore = [], [], False
+    try:
+        with os.scandir(folder) as it:
+            for entry in it:
+                name = entry.name
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    if not entry.is_symlink():
+                        dirs.append(name)
+                elif name.endswith('.i'):
+                    modules.append(name)
+                elif name == DOT_IGNORE_NAME:
+                    has_iignore = True
+    except OSError:
+        return None
+    dirs.sort()
+    modules.sort()
+    return Listing(tuple(dirs), tuple(modules), has_iignore)
+
+class DirSnapshot:
+    """
+    Remembers the Listing of each folder, along with the folder's mtime, in a file
+    on disk. Adding, removing or renaming an item changes a folder's mtime, so while
+    the mtime matches, the folder doesn't have to be listed again; checking costs a
+    stat instead of a scandir of the whole folder.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._folders = None
+        self._seen = set()
+        self._dirty = False
+
+    @property
+    def folders(self) -> dict:
+        """Maps a folder to (mtime_ns, dirs, modules, has_iignore)."""
+        if self._folders is None:
+            try:
+                with open(self.path, 'rb') as f:
+                    self._folders = marshal.load(f)
+            except (OSError, EOFError, ValueError, TypeError):
+                self._folders = {}
+        return self._folders
+
+    def listing(self, folder: str) -> Optional[Listing]:
+        """Return the Listing of a folder, from the snapshot if it's still valid."""
+        try:
+            mtime_ns = os.stat(folder).st_mtime_ns
+        except OSError:
+            return None
+        self._seen.add(folder)
+        cached = self.folders.get(folder)
+        if cached and cached[0] == mtime_ns:
+            return Listing(*cached[1:])
+        listing = list_folder(folder)
+        if listing is None:
+            return None
+        self.folders[folder] = (trusted_mtime_ns(mtime_ns),) + tuple(listing)
+        self._dirty = True
+        return listing
+
+    def save(self) -> None:
+        """Persist the listings of the folders seen since the snapshot was loaded."""
+        folders = self.folders
+        if not self._dirty and len(self._seen) == len(folders):
+            return
+        folders = {folder: folders[folder] for folder in self._seen if folder in folders}
+        atomic_write(self.path, lambda f: marshal.dump(folders, f))
+        self._folders = folders
+        self._dirty = False
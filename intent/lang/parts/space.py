@@ -5,9 +5,16 @@ import uuid
 
 OUT_PAT = re.compile(r'^[\t ]*out/', re.MULTILINE)
 
-from .fs import canonical_path, enforced_canonical_folder, folders_back_to_root
-from .iignore import DOT_IGNORE_NAME, DEFAULT_IIGNORE, DEFAULT_GITIGNORE
+from .fs import canonical_path, enforced_canonical_folder, folders_back_to_root, join_canonical, relative_canonical
+from .iignore import DOT_IGNORE_NAME, DEFAULT_IIGNORE, DEFAULT_GITIGNORE, HierarchicalDotIIgnore
 from .module import Module
+from .manifest import CompileManifest, ManifestEntry
+from .parse_cache import ParseCache
+from .snapshot import DirSnapshot, Listing, list_folder
+from .timings import active_timings, start_timings, timed
+
+# Folder -> root of the space that contains it, or None; see Space.find_root.
+_ROOTS = {}
 
 DEFAULT_SPACE_I = '''# Define properties of this space.
 id: {space_id}
@@ -26,6 +33,10 @@ class Space:
     def __init__(self, path: str) -> None:
         self.path = enforced_canonical_folder(path)
         self._ignores = None
+        self._parse_cache = None
+        self._manifest = None
+        self._iignore = None
+        self._snapshot = None
 
     @property
     def name(self) -> str:
@@ -41,8 +52,39 @@ class Space:
                             yield line.strip()
         return self._ignores
     
-    def should_ignore(self, item_name):
-        return False
+    @property
+    def parse_cache(self) -> ParseCache:
+        """Trees of parsed modules, kept in out/ so unchanged modules aren't parsed again."""
+        if self._parse_cache is None:
+            self._parse_cache = ParseCache(self.rel_path_to_abs('out/parse_cache'))
+        return self._parse_cache
+
+    @property
+    def manifest(self) -> CompileManifest:
+        """What the last compile saw and produced, so the next one can skip unchanged modules."""
+        if self._manifest is None:
+            self._manifest = CompileManifest(self.rel_path_to_abs('out/compile_manifest'))
+        return self._manifest
+
+    @property
+    def snapshot(self) -> DirSnapshot:
+        """Listings of the space's folders, kept in out/ so unchanged folders aren't listed again."""
+        if self._snapshot is None:
+            self._snapshot = DirSnapshot(self.rel_path_to_abs('out/dir_snapshot'))
+        return self._snapshot
+
+    @property
+    def iignore(self) -> HierarchicalDotIIgnore:
+        """The .iignore rules of the space."""
+        if self._iignore is None:
+            self._iignore = HierarchicalDotIIgnore(self.path)
+        return self._iignore
+
+    def should_ignore(self, path: str) -> bool:
+        """Whether the .iignore rules of the space exclude a file or folder."""
+        if os.path.isdir(path):
+            return self.iignore.is_ignored_folder(path)
+        return self.iignore.test_path(path) is True
     
     def compile(self):
         """
@@ -51,42 +93,173 @@ class Space:
         pass
 
     def abs_path_to_rel(self, abs_path: str) -> str:
-        return "/" + os.path.relpath(abs_path, self.path)
+        abs_path = canonical_path(abs_path)
+        try:
+            return "/" + relative_canonical(abs_path, self.path)
+        except ValueError:
+            return "/" + os.path.relpath(abs_path, self.path)
 
     def rel_path_to_abs(self, rel_path: str) -> str:
         return canonical_path(os.path.join(self.path, rel_path))
     
-    def modules(self):
+    def modules(self, threads: int = 1, snapshot: bool = False):
         """
-        Return a list of all modules in the space.
+        Return a list of all modules in the space. The order is stable: a folder's
+        modules by name, then those in each of its subfolders, by name. If threads is
+        more than 1, folders are listed concurrently by that many threads, which
+        hides latency on network filesystems; the order is the same. If snapshot is
+        True, folders whose mtime hasn't changed since they were last listed are
+        taken from the snapshot in out/ instead of being listed again.
         """
-        for root, _, files in self.walk():
-            for file in files:
-                if file.endswith('.i'):
-                    yield Module(os.path.join(root, file))
+        lister = timed('walk', self.snapshot.listing if snapshot else list_folder)
+        iignore = self.iignore
+        iignore.refresh()
+        test_in_folder = timed('ignore', iignore.test_in_folder)
+        if threads > 1:
+            from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+            listings = {}
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                pending = {pool.submit(lister, self.path): self.path}
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        top = pending.pop(future)
+                        listing = listings[top] = future.result()
+                        if listing:
+                            # The listing says whether there's a .iignore, so deciding
+                            # which subfolders to list next needs no I/O here.
+                            iignore.learn(top, listing.has_iignore)
+                            for child in self._subfolders(top, listing, iignore.folder_state(top), test_in_folder):
+                                pending[pool.submit(lister, child)] = child
+            lister = listings.get
+        stack = [self.path]
+        while stack:
+            top = stack.pop()
+            listing = lister(top)
+            if listing is None:
+                continue
+            iignore.learn(top, listing.has_iignore)
+            state = iignore.folder_state(top)
+            for name in listing.modules:
+                path = join_canonical(top, name)
+                if not test_in_folder(state, path):
+                    yield Module(path, self)
+            stack.extend(reversed(self._subfolders(top, listing, state, test_in_folder)))
 
-    def compile(self):
+    @staticmethod
+    def _subfolders(top: str, listing: Listing, state, test_in_folder) -> list:
+        """The folders in a listing that aren't ignored, given the state of the folder listed."""
+        paths = [join_canonical(top, name) for name in listing.dirs]
+        return [path for path in paths if test_in_folder(state, path, True) is not True]
+
+    def compile(self, jobs: int = 1, threads: int = 1):
         """
         Compile the space into a form that can be used by the intent engine.
+        Only modules whose file or governing .iignores changed since the last
+        compile (per the manifest in out/) are compiled again; results for the
+        rest are reused. If jobs is more than 1, modules are compiled by that
+        many worker processes (0 means one per core). Either way, asts and
+        problems come back in the order that modules() yields the modules, and
+        threads is passed to modules().
         """
-        asts = []
-        problems = []
-        for module in self.modules():
-            ast, problem = module.compile()
-            if ast: asts.append(ast)
-            if problem: problems.append(problem)
+        results = self.compile_modules(jobs, threads).values()
+        asts = [ast for ast, _ in results if ast]
+        problems = [problem for _, problem in results if problem]
         return asts, problems
+
+    def compile_modules(self, jobs: int = 1, threads: int = 1) -> dict:
+        """Like compile(), but returns {path: (ast, problem)} for each module, in order."""
+        manifest = self.manifest
+        entries = {}
+        results = {}  # path -> (ast, problem), or None if the module must be compiled
+        stale = []    # (path, governing iignores) for each module to compile
+        governing_by_folder = {}
+        for module in self.modules(threads, snapshot=True):
+            governing = self._governing_iignores(module.folder, governing_by_folder)
+            entry = manifest.lookup(module.path, governing)
+            result = None
+            if entry:
+                if entry.problem:
+                    result = (None, entry.problem)
+                else:
+                    ast = self.parse_cache.tree(entry.digest)
+                    if ast is not None:
+                        result = (ast, None)
+            if result:
+                entries[module.path] = entry
+            else:
+                stale.append((module.path, governing))
+            results[module.path] = result
+        compiled = self._compile_paths([path for path, _ in stale], jobs)
+        for (path, governing), result in zip(stale, compiled):
+            results[path] = result
+            stamp = self.parse_cache.index.get(path)
+            if stamp:
+                entries[path] = ManifestEntry(*stamp, governing, result[1])
+        manifest.save(entries)
+        self.parse_cache.save()
+        self.snapshot.save()
+        return results
+
+    def _compile_paths(self, paths: list, jobs: int):
+        """Compile the modules at paths, yielding (ast, problem) for each, in order."""
+        if jobs == 0:
+            jobs = os.cpu_count() or 1
+        if jobs > 1 and len(paths) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            chunksize = max(1, len(paths) // (jobs * 4))
+            timings = active_timings()
+            with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(self.path, bool(timings))) as pool:
+                for ast, problem, stamp, phases in pool.map(_compile_in_worker, paths, chunksize=chunksize):
+                    if stamp: self.parse_cache.merge(stamp)
+                    if phases: timings.merge(phases)
+                    yield ast, problem
+        else:
+            compile_module = timed('compile', Module.compile)
+            for path in paths:
+                yield compile_module(Module(path, self))
+
+    def _governing_iignores(self, folder: str, memo: dict) -> tuple:
+        """
+        Return (folder, mtime_ns, size) for each .iignore in folder and the folders
+        above it, up to the root of the space, as of when their rules were read.
+        Memoized per folder in memo.
+        """
+        governing = memo.get(folder)
+        if governing is None:
+            chain = self.iignore.folder_state(folder).chain
+            governing = memo[folder] = tuple((d.folder,) + d.stamp for d in reversed(chain))
+        return governing
     
     @staticmethod
     def find_root(path: str = '.') -> str:
         """
         Find the root of the space that contains the given path. If the path
-        is not in a space, None is returned.
+        is not in a space, None is returned. Answers are cached for the whole
+        process, for every folder visited along the way, so resolving many
+        paths checks each ancestor for a space.i only once. Call forget_roots
+        if a space.i is created or removed other than by Space.init.
         """
-        for containing_folder in folders_back_to_root('path'):
+        visited = []
+        root = None
+        for containing_folder in folders_back_to_root(path):
+            try:
+                root = _ROOTS[containing_folder]
+                break
+            except KeyError:
+                pass
+            visited.append(containing_folder)
             if Space.is_space(containing_folder):
-                return containing_folder
-        return None
+                root = containing_folder
+                break
+        for folder in visited:
+            _ROOTS[folder] = root
+        return root
+
+    @staticmethod
+    def forget_roots() -> None:
+        """Clear the cache that find_root keeps."""
+        _ROOTS.clear()
     
     @staticmethod
     def is_space(path: str) -> bool:
@@ -115,6 +288,7 @@ class Space:
                         break
                     raise ValueError(f'Not initing at root of git repo ({containing_folder}).')
         space = Space(folder)
+        Space.forget_roots()
         gitignore = space.rel_path_to_abs('.gitignore')
         if not os.path.exists(gitignore):
             with open(gitignore, 'wt') as f:
@@ -136,24 +310,99 @@ class Space:
     
     def walk(self, topdown=True, onerror=None, followlinks=False, 
              match_file=any, match_dir=any, recurse_dir=any, 
-             include_ignored=False):
-        """
-        Walk the space. This is a convenience method that wraps os.walk.
-        It always starts from the root of the space. It is aware of .iignore
-        files, and it provides easy filtering and control over recursion.
-        """
-        ignore = lambda x: False if include_ignored else self.should_ignore
-        for root, dirs, files in os.walk(self.abspath, topdown=topdown, onerror=onerror, followlinks=followlinks):
-            if match_file is not None and match_file is not any:
-                files[:] = [f for f in files if match_file(f)]
-            # We use dirs for two different things: to return a list of dirs, and
-            # to control recursion. We can't just modify dirs in place here, because
-            # we need to start with an unmodified version of it at the bottom, when we're
-            # recursing. So if we're going to modify the list, make a copy first.
-            if match_dir is not None and match_dir is not any:
-                matched_dirs = [d for d in dirs if match_dir(d)]
+             include_ignored=False, entries=False):
+        """
+        Walk the space, yielding (folder, dirs, files) like os.walk. It always starts
+        from the root of the space. It is aware of .iignore files: ignored items are
+        left out, and ignored folders are never entered. It provides easy filtering
+        and control over recursion; match_file, match_dir and recurse_dir are passed
+        item names. If entries is True, dirs and files are os.DirEntry objects instead
+        of names, so callers can reuse the type and stat info that scandir gathered.
+        """
+        match_file = match_file or any
+        match_dir = match_dir or any
+        recurse_dir = recurse_dir or any
+        iignore = None if include_ignored else self.iignore
+        if iignore:
+            iignore.refresh()
+        stack = [self.path]
+        while stack:
+            top = stack.pop()
+            if type(top) is tuple:
+                # Bottom up, and everything below this folder has been yielded.
+                yield top
+                continue
+            scanned = _scan(top, iignore, onerror, followlinks, match_file, match_dir, recurse_dir, entries)
+            if scanned is None:
+                continue
+            dirs, files, children = scanned
+            if topdown:
+                yield top, dirs, files
             else:
-                matched_dirs = dirs
-            yield root, [d for d in matched_dirs if not ignore(d)], [f for f in files if not ignore(f)]
-            # Prune the recursion as requested.
-            dirs[:] = [d for d in dirs if recurse_dir(d) and not ignore(d)]
+                stack.append((top, dirs, files))
+            stack.extend(reversed(children))
+
+def _scan(top: str, iignore, onerror, followlinks, match_file, match_dir, recurse_dir, entries):
+    """
+    List one folder for Space.walk, in name order. Returns (dirs, files, children), where
+    children are the paths of the folders to descend into, or None if it can't be listed.
+    """
+    try:
+        with os.scandir(top) as it:
+            items = sorted(it, key=_entry_name)
+    except OSError as e:
+        if onerror is not None:
+            onerror(e)
+        return None
+    state = None
+    if iignore:
+        # (any is shadowed in this module, so look for the .iignore by hand.)
+        has_iignore = False
+        for entry in items:
+            if entry.name == DOT_IGNORE_NAME:
+                has_iignore = entry.is_file()
+                break
+        iignore.learn(top, has_iignore)
+        state = iignore.folder_state(top)
+    dirs, files, children = [], [], []
+    for entry in items:
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+        if is_dir:
+            if state and iignore.test_in_folder(state, entry.path, True) is True:
+                continue
+            if match_dir is any or match_dir(entry.name):
+                dirs.append(entry if entries else entry.name)
+            if recurse_dir is any or recurse_dir(entry.name):
+                if followlinks or not entry.is_symlink():
+                    children.append(entry.path)
+        else:
+            if state and iignore.test_in_folder(state, entry.path):
+                continue
+            if match_file is any or match_file(entry.name):
+                files.append(entry if entries else entry.name)
+    return dirs, files, children
+
+def _entry_name(entry: os.DirEntry) -> str:
+    return entry.name
+
+# The space that modules belong to, in a worker process of a parallel compile.
+_worker_space = None
+
+def _init_worker(space_path: str, timings: bool) -> None:
+    global _worker_space
+    _worker_space = Space(space_path)
+    if timings:
+        start_timings()
+
+def _compile_in_worker(path: str):
+    """
+    Compile one module in a worker. Also returns the parse cache's stamp for it, for
+    the parent's index, and the timings recorded, if any, for the parent's.
+    """
+    ast, problem = timed('compile', Module.compile)(Module(path, _worker_space))
+    stamp = _worker_space.parse_cache.index.get(path)
+    timings = active_timings()
+    return ast, problem, {path: stamp} if stamp else None, timings.take() if timings else None
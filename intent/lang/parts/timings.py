@@ -0,0 +1,76 @@
+import threading
+import time
+from typing import Callable, Optional
+
+class Timings:
+    """
+    Counts calls and adds up wall time for each phase of work (walk, ignore, read,
+    parse, compile). Phases may nest (compile includes read and parse), so times
+    don't sum to the total.
+    """
+    def __init__(self):
+        # Phase -> [calls, nanoseconds].
+        self.phases = {}
+        self._lock = threading.Lock()
+
+    def add(self, phase: str, ns: int, calls: int = 1) -> None:
+        with self._lock:
+            entry = self.phases.get(phase)
+            if entry is None:
+                self.phases[phase] = [calls, ns]
+            else:
+                entry[0] += calls
+                entry[1] += ns
+
+    def merge(self, phases: dict) -> None:
+        """Add phases recorded by another Timings (e.g., in a worker process)."""
+        for phase, (calls, ns) in phases.items():
+            self.add(phase, ns, calls)
+
+    def take(self) -> dict:
+        """Return the phases recorded so far, and start over."""
+        with self._lock:
+            phases, self.phases = self.phases, {}
+        return phases
+
+    def wrap(self, phase: str, func: Callable) -> Callable:
+        """Return func, recording each call to it under phase."""
+        clock, add = time.perf_counter_ns, self.add
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                add(phase, clock() - start)
+        return timed
+
+    def report(self) -> str:
+        lines = []
+        for phase, (calls, ns) in self.phases.items():
+            lines.append(f'{phase:<10} {calls:>9} calls {ns / 1e6:>11.1f} ms')
+        return '\n'.join(lines)
+
+# The Timings being recorded into, if any.
+_active = None
+
+def start_timings() -> Timings:
+    """Start recording timings in this process, and return where they go."""
+    global _active
+    _active = Timings()
+    return _active
+
+def stop_timings() -> Optional[Timings]:
+    """Stop recording timings, and return what was recorded, if anything."""
+    global _active
+    timings, _active = _active, None
+    return timings
+
+def active_timings() -> Optional[Timings]:
+    return _active
+
+def timed(phase: str, func: Callable) -> Callable:
+    """
+    Return func, wrapped to record its calls under phase if timings are being
+    recorded. Otherwise func comes back as is, so there's no cost when they aren't.
+    """
+    return _active.wrap(phase, func) if _active else func
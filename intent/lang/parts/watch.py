@@ -0,0 +1,237 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import struct
+import sys
+from typing import Optional, Set
+
+from .iignore import DOT_IGNORE_NAME
+from .module import Module
+from .space import Space
+
+def is_watched(name: str) -> bool:
+    """Whether a change to a file with this name can alter the result of compiling a space."""
+    return name.endswith('.i') or name == DOT_IGNORE_NAME
+
+class PollingWatcher:
+    """
+    Notices changes to .i and .iignore files under a folder by comparing the
+    stat of each against a snapshot. Works everywhere, but each poll walks the
+    whole tree.
+    """
+    def __init__(self, root: str, skip_dir=lambda path: False):
+        self.root = root
+        self.skip_dir = skip_dir
+        self._snapshot = self._scan()
+
+    def fileno(self) -> Optional[int]:
+        """There's nothing to wait on; changes are only noticed by polling."""
+        return None
+
+    def _scan(self) -> dict:
+        snapshot = {}
+        for folder, dirs, files in os.walk(self.root):
+            dirs[:] = [d for d in dirs if not self.skip_dir(os.path.join(folder, d))]
+            for name in files:
+                if is_watched(name):
+                    path = os.path.join(folder, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    snapshot[path] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def poll(self) -> Optional[Set[str]]:
+        """Return the paths that were created, changed or deleted since the last poll."""
+        snapshot = self._scan()
+        old = self._snapshot
+        self._snapshot = snapshot
+        changed = {path for path, stamp in snapshot.items() if old.get(path) != stamp}
+        changed.update(path for path in old if path not in snapshot)
+        return changed
+
+    def close(self) -> None:
+        pass
+
+IN_MODIFY = 0x2
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct('iIII')
+
+class InotifyWatcher:
+    """
+    Notices changes to .i and .iignore files under a folder with linux's inotify,
+    so a poll costs nothing when nothing changed. Its fileno() can be waited on
+    with select.
+    """
+    def __init__(self, root: str, skip_dir=lambda path: False):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.root = root
+        self.skip_dir = skip_dir
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._folders = {}  # watch descriptor -> folder
+        try:
+            self._watch_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    def fileno(self) -> int:
+        return self._fd
+
+    def _watch_tree(self, top: str) -> Set[str]:
+        """
+        Watch top and the folders below it. Returns the watched files found there.
+        Raises OSError if a folder can't be watched (e.g., the watch limit is hit),
+        since changes there would go unnoticed.
+        """
+        found = set()
+        for folder, dirs, files in os.walk(top):
+            dirs[:] = [d for d in dirs if not self.skip_dir(os.path.join(folder, d))]
+            wd = self._add_watch(self._fd, os.fsencode(folder), WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err == errno.ENOENT:
+                    continue  # already gone again
+                raise OSError(err, f'inotify_add_watch failed for {folder}')
+            self._folders[wd] = folder
+            found.update(os.path.join(folder, name) for name in files if is_watched(name))
+        return found
+
+    def poll(self) -> Optional[Set[str]]:
+        """
+        Return the paths that were created, changed or deleted since the last poll,
+        or None if events were lost and everything should be treated as changed.
+        Raises OSError if a new folder can't be watched.
+        """
+        changed = set()
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                return changed
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                raise
+            i = 0
+            while i < len(data):
+                wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, i)
+                i += EVENT_HEADER.size
+                name = os.fsdecode(data[i:i + length].rstrip(b'\0'))
+                i += length
+                if mask & IN_Q_OVERFLOW:
+                    changed = None
+                    continue
+                if mask & IN_IGNORED:
+                    self._folders.pop(wd, None)
+                    continue
+                folder = self._folders.get(wd)
+                if folder is None or not name or changed is None:
+                    continue
+                path = os.path.join(folder, name)
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO) and not self.skip_dir(path):
+                        changed.update(self._watch_tree(path))
+                    elif mask & (IN_DELETE | IN_MOVED_FROM):
+                        # We can't list what was in it anymore.
+                        changed = None
+                elif is_watched(name):
+                    changed.add(path)
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+def make_watcher(root: str, skip_dir=lambda path: False, polling: bool = False):
+    """Return an InotifyWatcher on linux (unless polling is requested), else a PollingWatcher."""
+    if not polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(root, skip_dir)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(root, skip_dir)
+
+class HotSpace:
+    """
+    Keeps a space and the results of compiling its modules in memory, and brings
+    them up to date by recompiling only the modules affected by file changes.
+    """
+    def __init__(self, path: str, polling: bool = False):
+        self.space = Space(path)
+        self.polling = polling
+        self._out = self.space.rel_path_to_abs('out')
+        # Start watching first, so changes made during the first compile aren't missed.
+        self.watcher = make_watcher(self.space.path, self._skip_dir, polling)
+        self.results = self.space.compile_modules()
+
+    def _skip_dir(self, folder: str) -> bool:
+        """Folders not worth watching: out/, .git, and anything the .iignore rules exclude."""
+        return (folder == self._out or os.path.basename(folder) == '.git'
+                or self.space.iignore.is_ignored_folder(folder))
+
+    def update(self) -> Optional[Set[str]]:
+        """
+        Apply changes noticed since the last update. Returns the paths of the modules
+        recompiled or dropped, or None if the whole space was compiled again.
+        """
+        try:
+            changed = self.watcher.poll()
+        except OSError:
+            # A new folder couldn't be watched; poll instead, and start over.
+            self.watcher.close()
+            self.polling = True
+            changed = None
+        if changed is None or any(os.path.basename(p) == DOT_IGNORE_NAME for p in changed):
+            # What's included may have changed, and so may which folders are worth
+            # watching. The manifest makes this recompile only the modules whose
+            # files or governing .iignores changed.
+            self.space.iignore.refresh(rediscover=True)
+            self.watcher.close()
+            self.watcher = make_watcher(self.space.path, self._skip_dir, self.polling)
+            self.space.parse_cache.save()
+            self.results = self.space.compile_modules()
+            return None
+        iignore = self.space.iignore
+        added = False
+        for path in changed:
+            if os.path.isfile(path) and iignore.test_path(path) is not True:
+                added = added or path not in self.results
+                self.results[path] = Module(path, self.space).compile()
+            else:
+                self.results.pop(path, None)
+        if added:
+            # Keep results in the order modules() yields them.
+            order = [module.path for module in self.space.modules(snapshot=True)]
+            self.results = {path: self.results[path] for path in order if path in self.results}
+        if changed:
+            self.space.parse_cache.save()
+        return changed
+
+    def compile(self):
+        """Return (asts, problems), like Space.compile, for the space as it is now."""
+        self.update()
+        results = self.results.values()
+        asts = [ast for ast, _ in results if ast]
+        problems = [problem for _, problem in results if problem]
+        return asts, problems
+
+    def close(self) -> None:
+        self.watcher.close()
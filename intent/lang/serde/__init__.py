@@ -1,2 +1,2 @@
-from .parse import load, dump
+from .parse import load, load_iter, dump, PARSER_VERSION
 from .pieces import Chunk, List, Dict
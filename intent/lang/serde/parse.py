@@ -1,22 +1,66 @@
+import io
+import re
+
 from abc import ABC, abstractmethod
+from array import array
 from enum import Enum
-from typing import NamedTuple
+from typing import Iterable, Iterator, NamedTuple, Optional, TextIO, Union
+
+from .pieces import Code, Dict, List, Chunk, TextSpan, first_two_tokens, first_non_space_char, write_code
 
-from .pieces import Code, Dict, List, Chunk, first_two_tokens, first_non_space_char
+__all__ = ["load", "load_iter", "dump", "PARSER_VERSION"]
 
-__all__ = ["load", "dump", "Value"]
+# Bump this whenever a change to the parser or to the classes in pieces alters the
+# trees that load() builds, so trees cached on disk by older versions are not reused.
+PARSER_VERSION = 1
 
 VALID_LIST_ITEM_BULLETS = ['-', '- ', '-\n', '-\r']
 
-def end_of_indent(data: str, i: int, end: int) -> tuple:
-    while i < end:
-        c = data[i]
-        if c != ' ': break
-        i += 1
-    return i
+# Matches the indent and the content of a single line, stopping short of its
+# line terminator (\r\n, \r, or \n).
+LINE_PAT = re.compile(r'( *)[^\r\n]*')
+
+class LineIndex:
+    """
+    A table of line boundaries for a document, built in a single pass when
+    parsing begins. Parsers index into it by line number instead of rediscovering
+    indents and line ends one character at a time. For the line at index i
+    (line number i + 1), starts[i] is the offset where the line begins, indents[i]
+    is the offset just past its leading spaces, and ends[i] is the offset of its
+    line terminator (or of eof). If the document is a fragment of a larger stream,
+    first_line_num says which line of the stream it begins on, so that line numbers
+    in errors stay true.
+    """
+    __slots__ = ('data', 'base', 'starts', 'indents', 'ends')
+
+    def __init__(self, data: str, first_line_num: int = 1):
+        self.data = data
+        self.base = first_line_num - 1
+        starts = self.starts = array('l')
+        indents = self.indents = array('l')
+        ends = self.ends = array('l')
+        match = LINE_PAT.match
+        eof = len(data)
+        i = 0
+        while i < eof:
+            m = match(data, i)
+            starts.append(i)
+            indents.append(m.end(1))
+            i = m.end()
+            ends.append(i)
+            if i < eof and data[i] == '\r': i += 1
+            if i < eof and data[i] == '\n': i += 1
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def start_of(self, line_num: int) -> int:
+        """Return the offset where the given (1-based) line begins, or eof if past the end."""
+        i = line_num - 1 - self.base
+        return self.starts[i] if i < len(self.starts) else len(self.data)
 
 def raise_on_bad_indent(data: str, start_of_line: int, end_of_indent: int, line_num: int, current_indent: int):
-    if data[end_of_indent] == '\t':
+    if data.startswith('\t', end_of_indent):
         raise ValueError(f"Invalid indent (tab) on line {line_num}. Only 2-space indents are allowed.")
     indent = end_of_indent - start_of_line
     if indent % 2 == 1:
@@ -24,18 +68,6 @@ def raise_on_bad_indent(data: str, start_of_line: int, end_of_indent: int, line_
     if indent > current_indent + 2:
         raise ValueError(f"Too indented ({indent} spaces) on line {line_num}. Expected max {current_indent + 2}.")
 
-def end_of_line(data: str, i: int, end: int) -> int:
-    while i < end:
-        c = data[i]
-        if c in '\n\r': return i
-        i += 1
-    return end
-
-def skip_eol(data: str, i: int, end: int) -> int:
-    if i < end and data[i] == '\r': i += 1
-    if i < end and data[i] == '\n': i += 1
-    return i
-
 def find_char_in_escaped(txt: str, ch: str) -> int:
     skip_next = False
     for i, c in enumerate(txt):
@@ -46,24 +78,19 @@ def find_char_in_escaped(txt: str, ch: str) -> int:
             return i
         elif c == '\\':
             skip_next = True
-
-class SplitLineTuple(NamedTuple):
-    end_of_indent: int
-    end_of_line: int
-
-def split_line(data: str, i: int, eof: int) -> SplitLineTuple:
-    eoi = end_of_indent(data, i, eof)
-    eol = end_of_line(data, i, eof)
-    return SplitLineTuple(eoi, eol)
+    return -1
 
 class ParsePoint(NamedTuple):
-    data: str
+    lines: LineIndex
     start: int = 0
     line_num: int = 1
     indent: int = 0
     above: str = ''
+    @property
+    def data(self) -> str:
+        return self.lines.data
     def delta(self, start: int = None, line_num: int = None, indent: int = None, above: str = None) -> 'ParsePoint':
-        return ParsePoint(self.data, 
+        return ParsePoint(self.lines, 
                           self.start if start is None else start,
                           self.line_num if line_num is None else line_num, 
                           self.indent if indent is None else indent, 
@@ -89,24 +116,43 @@ def skip_above(point: ParsePoint) -> SkipAboveTuple:
     """
     Advance to the next line that contains content, accumulating blank lines and
     comments so they can be attached to what comes next. If indent rules are
-    violated in the process, raise a ValueError.
+    violated in the process, raise a ValueError. If only comments and blank lines
+    remain, the returned start is eof.
     """
-    start_of_line = point.start
-    line_num = point.line_num
-    above = ''
-    eof = len(point.data)
-    while start_of_line < eof:
-        end_of_indent, end_of_line = split_line(point.data, start_of_line, eof)
-        raise_on_bad_indent(point.data, start_of_line, end_of_indent, line_num, point.indent)
-        if end_of_indent == end_of_line:
-            above += point.data[start_of_line:end_of_line] + '\n'
+    return _skip_above(point.lines, point.line_num, point.indent, point.above)
+
+def _skip_above(lines: LineIndex, line_num: int, indent: int, carried) -> SkipAboveTuple:
+    data = lines.data
+    base = lines.base
+    starts, indents, ends = lines.starts, lines.indents, lines.ends
+    first = None
+    for i in range(line_num - 1 - base, len(starts)):
+        start_of_line = starts[i]
+        end_of_indent = indents[i]
+        end_of_line = ends[i]
+        raise_on_bad_indent(data, start_of_line, end_of_indent, i + 1 + base, indent)
+        if end_of_indent == end_of_line or data[end_of_indent] == '#':
+            if first is None: first = i
         else:
-            if point.data[end_of_indent] == '#':
-                above += point.data[start_of_line:end_of_line] + '\n'
-            else:
-                return SkipAboveTuple(start_of_line, end_of_indent, end_of_line, line_num, above)
-        start_of_line = skip_eol(point.data, end_of_line, eof)
-        line_num += 1
+            above = join_above(carried, lines, first, i)
+            return SkipAboveTuple(start_of_line, end_of_indent, end_of_line, i + 1 + base, above)
+    eof = len(data)
+    above = join_above(carried, lines, first, len(starts))
+    return SkipAboveTuple(eof, eof, eof, len(starts) + 1 + base, above)
+
+def join_above(carried, lines: LineIndex, first: int, stop: int):
+    """
+    Combine comments carried from earlier with the lines from first up to (not
+    including) stop. The lines are referenced as a TextSpan rather than copied.
+    """
+    if first is None:
+        return carried
+    span = TextSpan(lines.data, lines.starts[first], lines.ends[stop - 1])
+    if not carried:
+        return span
+    if isinstance(carried, TextSpan) and carried.src is span.src and first and carried.stop == lines.ends[first - 1]:
+        return TextSpan(span.src, carried.start, span.stop)
+    return str(carried) + span.text
 
 class UnknownContainerParser(Parser):
     def parse(self, start_at: ParsePoint) -> ParseResult:
@@ -115,30 +161,11 @@ class UnknownContainerParser(Parser):
         it is, and consumes just enough text to figure out whether to pass the job off
         to a DictParser or a ListParser.
         """
-        above = start_at.above
-        start_of_line = start_at.start
-        line_num = start_at.line_num
-        data = start_at.data
-
-        start_of_line, end_of_indent, _, line_num, above = skip_above(
-            start_at.delta(start_of_line, line_num))
-        this_indent = end_of_indent - start_of_line
-        if this_indent == start_at.indent:
-            clip = data[end_of_indent:end_of_indent + 2]
-            if clip in VALID_LIST_ITEM_BULLETS:
-                handoff_to = ListParser()
-            else:
-                handoff_to = DictParser()
-            code, resume_at = handoff_to.parse(start_at)
-            return code, resume_at
-        elif this_indent < start_at.indent:
-            # We found something other than a comment that is less indented than us,
-            # so we're done parsing.
-            code = Chunk.from_tail(above)
-            resume_at = start_at.delta(start_of_line, line_num, above)
-            return code, resume_at
-        else:
-            raise ValueError(f"Premature indent on line {line_num}.")
+        opened = _open_container(start_at.lines, start_at.start, start_at.line_num, start_at.indent, start_at.above)
+        if isinstance(opened, tuple):
+            code, start_of_line, line_num = opened
+            return code, start_at.delta(start=start_of_line, line_num=line_num, above='')
+        return _run(opened)
 
 class DictParser(Parser):
     def parse(self, start_at: ParsePoint) -> ParseResult:
@@ -146,23 +173,105 @@ class DictParser(Parser):
         Implements a state machine to parse a dictionary from a string. For docs on the state
         machine, see https://bit.ly/3OE2UJo.
         """
-        above = start_at.above
-        start_of_line = start_at.start
-        line_num = start_at.line_num
-        data = start_at.data
+        return _run(_DictFrame(start_at.lines, start_at.start, start_at.line_num, start_at.indent, start_at.above))
+
+class ListParser:
+    def parse(self, start_at: ParsePoint) -> ParseResult:
+        """
+        Implements a state machine to parse a list from a string. For docs on the state
+        machine, see https://bit.ly/3OE2UJo.
+        """
+        return _run(_ListFrame(start_at.lines, start_at.start, start_at.line_num, start_at.indent, start_at.above))
+
+# The parsers share one loop, _run(), which keeps the containers being parsed on an
+# explicit stack rather than recursing into a new parser for each level of nesting,
+# so documents can nest arbitrarily deep.
+
+class _Frame:
+    """A container that _run() is partway through parsing."""
+    __slots__ = ('lines', 'indent', 'start_of_line', 'line_num', 'above', 'result', 'end_indent')
+
+    def __init__(self, lines: LineIndex, start_of_line: int, line_num: int, indent: int, above):
+        self.lines = lines
+        self.indent = indent
+        self.start_of_line = start_of_line
+        self.line_num = line_num
+        self.above = above
+        self.result = None
+        self.end_indent = indent  # indent of the line that ended the container
+
+    def run(self):
+        """
+        Parse lines until the container ends (return None) or a nested container
+        begins. Then return the frame of the nested container, or (code, start_of_line,
+        line_num) if it turned out to hold nothing but comments.
+        """
+        raise NotImplementedError
+
+    def resume(self, code: Code, start_of_line: int, line_num: int) -> None:
+        """Take the result of a nested container, and carry on from where it ended."""
+        raise NotImplementedError
+
+def _run(frame: _Frame) -> ParseResult:
+    stack = [frame]
+    while True:
+        nested = stack[-1].run()
+        if nested is None:
+            done = stack.pop()
+            if not stack:
+                return done.result, ParsePoint(done.lines, done.start_of_line, done.line_num, done.end_indent)
+            stack[-1].resume(done.result, done.start_of_line, done.line_num)
+        elif isinstance(nested, tuple):
+            stack[-1].resume(*nested)
+        else:
+            stack.append(nested)
+
+def _open_container(lines: LineIndex, start_of_line: int, line_num: int, indent: int, above):
+    """
+    What UnknownContainerParser does: look past comments to see what kind of container
+    begins at line_num, and return a frame to parse it. If nothing but comments come
+    before eof or an outdent, return (tail chunk, start_of_line, line_num) instead.
+    """
+    data = lines.data
+    start_of_next, end_of_indent, _, next_num, comments = _skip_above(lines, line_num, indent, above)
+    this_indent = end_of_indent - start_of_next
+    if start_of_next == len(data) or this_indent < indent:
+        # Nothing but comments remain in the container, so it's empty.
+        return Chunk.from_tail(comments), start_of_next, next_num
+    if this_indent > indent:
+        raise ValueError(f"Premature indent on line {next_num}.")
+    # The parser handed off to skips the comments again, and keeps them.
+    if data[end_of_indent:end_of_indent + 2] in VALID_LIST_ITEM_BULLETS:
+        return _ListFrame(lines, start_of_line, line_num, indent, above)
+    return _DictFrame(lines, start_of_line, line_num, indent, above)
+
+class _DictFrame(_Frame):
+    __slots__ = ('prev_key', 'prev_value', 'first_line')
+
+    def __init__(self, lines: LineIndex, start_of_line: int, line_num: int, indent: int, above):
+        super().__init__(lines, start_of_line, line_num, indent, above)
+        self.result = Dict()
+        self.prev_key: Chunk = None
+        self.prev_value: Chunk = None
+        self.first_line = True
+
+    def run(self):
+        lines = self.lines
+        data = lines.data
         eof = len(data)
-        result: Dict = Dict()
-        prev_key: Chunk = None
-        prev_value: Chunk = None
-        first_line = True
+        indent = self.indent
+        result = self.result
+        above = self.above
+        start_of_line = self.start_of_line
+        line_num = self.line_num
 
         while start_of_line < eof:
-            start_of_line, end_of_indent, end_of_line, line_num, above = skip_above(
-                start_at.delta(start_of_line, line_num))
+            start_of_line, end_of_indent, end_of_line, line_num, above = _skip_above(lines, line_num, indent, above)
+            if start_of_line == eof:
+                break
             this_indent = end_of_indent - start_of_line
             first_char = data[end_of_indent]
-            line = None
-            
+
             # DictParser normally consumes only lines that begin with as many spaces as its
             # indent. However, its first line requires special handling because a DictParser
             # might have be invoked by a ListParser that saw a list item that it determined
@@ -174,10 +283,10 @@ class DictParser(Parser):
             # In such a case, the first line that this parser encounters will begin with '-'
             # at the start, which we need to ignore. If we detect this condition, pretend
             # that we saw a normally indented line.
-            if first_line:
-                first_line = False
+            if self.first_line:
+                self.first_line = False
                 # Did we detect an outdent (indent is 2 smaller than it should be)?
-                if this_indent == start_at.indent - 2:
+                if this_indent == indent - 2:
                     if data[end_of_indent:end_of_indent+2] in VALID_LIST_ITEM_BULLETS:
                         # The number of spaces after "-" is irrelevant, even though
                         # it should be one.
@@ -185,104 +294,200 @@ class DictParser(Parser):
                         first_char = data[end_of_indent]
                         if end_of_indent > end_of_line: end_of_line = end_of_indent
                         # Treat us as normally indented despite the list item bullet.
-                        this_indent = start_at.indent
-                        line = ' '*this_indent + data[end_of_indent:end_of_line]
+                        this_indent = indent
 
-            if this_indent == start_at.indent:
+            if this_indent == indent:
                 if first_char == '-':
                     raise ValueError(f"Expected key: value instead of list item on line {line_num}.")
-                if line is None: # almost always true, except with weird first lines
-                    line = data[start_of_line:end_of_line]
-                colon = find_char_in_escaped(line, ':') if first_char in '\'"' else line.find(":")
+                if first_char in '\'"':
+                    colon = find_char_in_escaped(data[end_of_indent:end_of_line], ':')
+                    if colon != -1: colon += end_of_indent
+                else:
+                    colon = data.find(':', end_of_indent, end_of_line)
                 if colon == -1:
                     raise ValueError(f"No key: value on line {line_num}.")
-                key = Chunk.from_dictkey(line[:colon+1], above)
+                # Everything before the key's text (the indent, plus the bullet on the
+                # first line of a dict in a list) becomes its pre.
+                key = Chunk.from_source_key(data, start_of_line, colon + 1, above, end_of_indent)
                 above = ''
-                value = Chunk.from_dictvalue(line[colon + 1:])
+                value = Chunk.from_source_value(Chunk.Mode.DICT_VALUE, data, colon + 1, end_of_line)
                 result[key] = value
-                prev_value = value
-                prev_key = key
-            elif this_indent == start_at.indent + 2:
-                if prev_value is None:
+                self.prev_value = value
+                self.prev_key = key
+            elif this_indent == indent + 2:
+                if self.prev_value is None:
                     raise ValueError(f"Premature indent on line {line_num}. Expected key: value.")
-                nest_at = ParsePoint(data, start_of_line, line_num, this_indent, above)
-                above = ''
-                nest_to = UnknownContainerParser()
-                details, resume_at = nest_to.parse(nest_at)
-                # Reinterpret the previous value as trailing text after key rather than a value.
-                prev_key.post += str(prev_value)
-                result[prev_key] = details
-                _, start_of_line, line_num, _, above = resume_at
-                continue
-            elif this_indent < start_at.indent:
+                # The value of the previous key is a nested container.
+                return _open_container(lines, start_of_line, line_num, this_indent, above)
+            elif this_indent < indent:
                 if above:
                     result[None] = Chunk.from_tail(above)
-                resume_at = ParsePoint(data, start_of_line, line_num, this_indent)
-                return result, resume_at
-            else: #this_indent > start_at.indent but not 2
+                self.start_of_line, self.line_num, self.end_indent = start_of_line, line_num, this_indent
+                return None
+            else: #this_indent > indent but not 2
                 assert not "In theory, this should have been caught in raise_on_bad_intent"
-            start_of_line = skip_eol(data, end_of_line, eof)
             line_num += 1
-        return result, start_at.delta(start_of_line, line_num, above)
+            start_of_line = lines.start_of(line_num)
+        if above:
+            result[None] = Chunk.from_tail(above)
+        self.start_of_line, self.line_num = start_of_line, line_num
+        return None
 
-class ListParser:
-    def parse(self, start_at: ParsePoint) -> ParseResult:
-        """
-        Implements a state machine to parse a list from a string. For docs on the state
-        machine, see https://bit.ly/3OE2UJo.
-        """
-        above = start_at.above
-        start_of_line = start_at.start
-        line_num = start_at.line_num
-        data = start_at.data
+    def resume(self, details: Code, start_of_line: int, line_num: int) -> None:
+        # Reinterpret the previous value as trailing text after key rather than a value.
+        self.prev_key.absorb(self.prev_value)
+        self.result[self.prev_key] = details
+        self.start_of_line, self.line_num, self.above = start_of_line, line_num, ''
+
+class _ListFrame(_Frame):
+    # head is the line of a bullet that stands alone, while the item nested under it is parsed.
+    __slots__ = ('head',)
+
+    def __init__(self, lines: LineIndex, start_of_line: int, line_num: int, indent: int, above):
+        super().__init__(lines, start_of_line, line_num, indent, above)
+        self.result = List()
+        self.head: Chunk = None
+
+    def run(self):
+        lines = self.lines
+        data = lines.data
         eof = len(data)
-        result: List = List()
+        indent = self.indent
+        result = self.result
+        above = self.above
+        start_of_line = self.start_of_line
+        line_num = self.line_num
 
         while start_of_line < eof:
-            start_of_line, end_of_indent, end_of_line, line_num, above = skip_above(
-                start_at.delta(start_of_line, line_num))
+            start_of_line, end_of_indent, end_of_line, line_num, above = _skip_above(lines, line_num, indent, above)
+            if start_of_line == eof:
+                break
             this_indent = end_of_indent - start_of_line
-            if this_indent == start_at.indent:
+            if this_indent == indent:
                 line = data[end_of_indent:end_of_line]
-                handoff_to = None
                 if line == '-':
+                    # The bullet stands alone; what follows on the next lines is the item.
+                    self.head = Chunk(Chunk.Mode.LIST_VALUE, above=above, pre=data[start_of_line:end_of_line])
                     line_num += 1
-                    start_of_line = skip_eol(data, end_of_line, eof)
-                    handoff_to = UnknownContainerParser()
+                    return _open_container(lines, lines.start_of(line_num), line_num, indent + 2, '')
                 elif line.startswith('- '):
                     line = line[2:]
                     _, end_of_first_text = first_two_tokens(line)
                     if line.find(':', end_of_first_text) != -1:
-                        handoff_to = DictParser()
+                        return _DictFrame(lines, start_of_line, line_num, indent + 2, above)
                 else:
                     raise ValueError(f"Expected list item on line {line_num}.")
-                if not handoff_to:
-                    value = Chunk.from_listvalue(line)
-                    result.append(value)
-                else:
-                    new_indent = this_indent + 2
-                    handoff_at = start_at.delta(start=start_of_line, line_num=line_num, indent=new_indent, above=above)
-                    above = ''
-                    value, resume_at = handoff_to.parse(handoff_at)
-                    result.append(value)
-                    _, start_of_line, line_num, _, above = resume_at
-                    continue
-            elif this_indent < start_at.indent:
+                # The indent and bullet become part of the value's pre.
+                text_start, _ = first_two_tokens(data, end_of_indent + 2, end_of_line)
+                value = Chunk.from_source_value(Chunk.Mode.LIST_VALUE, data, start_of_line, end_of_line, above, text_start)
+                above = ''
+                result.append(value)
+            elif this_indent < indent:
                 if above:
-                    result[None] = Chunk.from_tail(above)
-                resume_at = ParsePoint(data, start_of_line, line_num, this_indent)
-                return result, resume_at
-            else: #this_indent > start_at.indent
+                    result.append(Chunk.from_tail(above))
+                self.start_of_line, self.line_num, self.end_indent = start_of_line, line_num, this_indent
+                return None
+            else: #this_indent > indent
                 assert not "In theory, this should have been caught in raise_on_bad_intent"
-            start_of_line = skip_eol(data, end_of_line, eof)
             line_num += 1
-        return result, start_at.delta(start_of_line, line_num, above)
+            start_of_line = lines.start_of(line_num)
+        if above:
+            result.append(Chunk.from_tail(above))
+        self.start_of_line, self.line_num = start_of_line, line_num
+        return None
+
+    def resume(self, value: Code, start_of_line: int, line_num: int) -> None:
+        above = ''
+        head, self.head = self.head, None
+        if head is not None:
+            if isinstance(value, Chunk):
+                # Nothing was nested under the bullet, so the item is an empty
+                # value, and any comments we passed belong to what comes next.
+                above = value.above
+                value = head
+            else:
+                value.head = head
+        self.result.append(value)
+        self.start_of_line, self.line_num, self.above = start_of_line, line_num, above
 
 def load(data: str) -> dict:
     parser = DictParser()
-    start_at = ParsePoint(data)
+    start_at = ParsePoint(LineIndex(data))
     result, _ = parser.parse(start_at)
     return result
 
-def dump(data: dict) -> str:
-    pass
+def _parse_fragment(parser: Parser, lines: list, first_line_num: int, above: str) -> Code:
+    """Parse lines taken from the middle of a stream, keeping line numbers true to the stream."""
+    lines = LineIndex(''.join(lines), first_line_num)
+    result, _ = parser.parse(ParsePoint(lines, line_num=first_line_num, above=above))
+    return result
+
+def _entries(container: Code) -> list:
+    return list(container.items()) if isinstance(container, Dict) else list(container)
+
+def load_iter(source: Union[str, Iterable[str]]) -> Iterator:
+    """
+    Load a document incrementally from a file object (or any other iterable of lines),
+    yielding each top-level entry as soon as it is complete: (key, value) pairs if the
+    document is a dict, or items if it is a list. Only the entry being read is held in
+    memory, so the cost is bounded by the largest top-level entry rather than by the
+    whole document.
+
+    Comments and blank lines end up exactly where load() would put them. Any that
+    trail the last entry are yielded at the end as a TAIL chunk (with a key of None,
+    if the document is a dict), so Dict(load_iter(f)) is equivalent to load(f.read()).
+    """
+    if isinstance(source, str):
+        source = io.StringIO(source)
+    parser = None
+    pending = []         # lines of the current top-level entry, plus comments around it
+    first_line_num = 1   # line number of pending[0]
+    has_content = False  # whether pending holds an entry yet, or just comments
+    above = ''           # comments carried over from the previous entry
+    line_num = 0
+    for line in source:
+        line_num += 1
+        if not line.endswith(('\n', '\r')):
+            line += '\n'
+        indented = line[0] == ' '
+        if line.lstrip(' ')[0] in '#\r\n':
+            pending.append(line)
+            continue
+        if parser is None:
+            is_list = not indented and line[:2] in VALID_LIST_ITEM_BULLETS
+            parser = ListParser() if is_list else DictParser()
+        elif not indented and has_content:
+            # An unindented line begins the next top-level entry, so the one in
+            # pending is complete.
+            entries = _entries(_parse_fragment(parser, pending, first_line_num, above))
+            yield entries[0]
+            # If comments after the entry ended up as a tail of the top-level container
+            # (because the entry had no nested container to absorb them), then in a
+            # full load() they'd be above the next entry. Carry them forward.
+            above = ''
+            if len(entries) > 1:
+                tail = entries[1][1] if isinstance(parser, DictParser) else entries[1]
+                above = tail.above
+            pending = []
+            first_line_num = line_num
+        pending.append(line)
+        has_content = True
+    if pending:
+        yield from _entries(_parse_fragment(parser or DictParser(), pending, first_line_num, above))
+
+def dump(data, fp: TextIO = None) -> Optional[str]:
+    """
+    Serialize data as code. Trees returned by load() are reproduced exactly,
+    comments and all, except that line breaks are normalized to \\n and the
+    text always ends with one. Plain python dicts, lists and scalars (or a mix
+    of plain and parsed values) are laid out with 2-space indents.
+
+    If fp is given, the code is written straight to it and None is returned.
+    Otherwise, the code is returned as a string.
+    """
+    if fp is not None:
+        write_code(data, fp.write)
+        return None
+    parts = []
+    write_code(data, parts.append)
+    return ''.join(parts)
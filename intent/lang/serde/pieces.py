@@ -1,4 +1,5 @@
 import ast
+import datetime
 import warnings
 import re
 
@@ -6,23 +7,29 @@ from abc import ABC, abstractmethod
 from enum import Enum
 from typing import NamedTuple
 
+from .primitives import (STR, classify_and_deserialize, serialize_null, serialize_bool,
+                         serialize_int, serialize_float, serialize_date)
+
 INVALID_ESC_SEQ_PAT = re.compile(r"invalid escape sequence [\"']\\.[\"']")
 
-__all__ = ["Chunk", "List", "Dict"]
+__all__ = ["Chunk", "List", "Dict", "TextSpan", "decode_quoted", "safe_literal_eval", "INVALID_ESC_SEQ_PAT"]
 
 class Code(ABC):
     """A construct that can be converted to code."""
+    __slots__ = ()
+
     @property
     @abstractmethod
     def code(self) -> str:
         """Return this construct and all its surrounding text, as it appears in code."""
         pass
 
-def first_non_space_char(s, offset=0):
-    for i, c in enumerate(s, offset):
-        if c != " ":
-            return i
-    return 0
+NON_SPACE_PAT = re.compile(r'[^ ]')
+EOL_PAT = re.compile(r'\r\n?')
+
+def first_non_space_char(s, offset=0, end=None):
+    m = NON_SPACE_PAT.search(s, offset, len(s) if end is None else end)
+    return m.start() if m else 0
 
 def safe_literal_eval(s):
     """
@@ -43,37 +50,101 @@ def safe_literal_eval(s):
             else:
                 raise ValueError(txt)
             
-def start_of_space_before(line, i):
+# Chars that can follow a backslash in one of python's escape sequences.
+ESCAPE_LEADS = frozenset('\\\'"abfnrtv01234567xuUN')
+
+def decode_quoted(txt: str, quote: str) -> str:
+    """
+    Return the value of the text between a pair of quote chars, with python escape
+    sequences (\\n, \\x3a, \\u00e9, \\N{...}, octal, and so on) replaced by the chars they
+    stand for. This gives the same result as evaluating the text as a python string
+    literal, but decodes with the unicode_escape codec instead of compiling anything,
+    and text with no backslash is returned as is. Raises a ValueError for an invalid
+    escape or an unescaped quote char.
+    """
+    parts = txt.split('\\')
+    if quote in parts[0]:
+        raise ValueError(f"Unescaped {quote} inside quoted chunk.")
+    if len(parts) == 1:
+        return txt
+    # Each part after the first followed a backslash. That backslash begins an escape
+    # sequence, unless it was itself escaped by the backslash before it.
+    escaping = True
+    last = len(parts) - 1
+    for i in range(1, len(parts)):
+        part = parts[i]
+        if not escaping:
+            escaping = True
+            rest = part
+        elif not part:
+            if i == last:
+                raise ValueError("unterminated string literal")
+            escaping = False
+            continue
+        elif part[0] not in ESCAPE_LEADS:
+            # Same wording as the errors matched by INVALID_ESC_SEQ_PAT.
+            raise ValueError(f"invalid escape sequence '\\{part[0]}'")
+        else:
+            rest = part[1:]
+        if quote in rest:
+            raise ValueError(f"Unescaped {quote} inside quoted chunk.")
+    try:
+        # Chars beyond latin-1 become escape sequences themselves, which the codec
+        # turns back into the same chars.
+        return txt.encode('latin-1', 'backslashreplace').decode('unicode_escape')
+    except UnicodeDecodeError as e:
+        raise ValueError(e.reason)
+
+def start_of_space_before(line, i, lo=0):
     """
     Given a line like abc  : def, and the offset of :,
     find the first space char after abc.
     """
     j = i - 1
-    while j >= 0 and line[j] == ' ':
+    while j >= lo and line[j] == ' ':
         j -= 1
     return j + 1
 
-def guarantee_non_empty_ends_with_new_line(txt):
-    return txt + "\n" if (txt and not txt.endswith("\n")) else txt
-
 class FirstTwoTokensTuple(NamedTuple):
     end_of_indent: int
     end_of_first_text: int
 
-def first_two_tokens(line) -> FirstTwoTokensTuple:
-    end_of_indent = first_non_space_char(line)
+def first_two_tokens(line, start=0, end=None) -> FirstTwoTokensTuple:
+    if end is None: end = len(line)
+    end_of_indent = first_non_space_char(line, start, end)
+    if end_of_indent < start: end_of_indent = start
     end_of_first_text = end_of_indent
-    if end_of_indent < len(line):
+    if end_of_indent < end:
         c = line[end_of_indent]
         # Figure out where to start looking for comment. If we have a quoted value,
         # skip to the end quote. Otherwise, begin looking right where we are.
         if c in '\'"':
-            end_of_first_text = line.find(c, end_of_indent + 1)
+            end_of_first_text = line.find(c, end_of_indent + 1, end)
             if end_of_first_text == -1:
                 raise ValueError("No closing quote.")
             end_of_first_text += 1
     return FirstTwoTokensTuple(end_of_indent, end_of_first_text)
 
+class TextSpan(NamedTuple):
+    """
+    A run of whole lines (blank lines and comments) in a source document, kept as
+    offsets so the text is only copied out if somebody asks for it. The text is
+    each line followed by \\n, whatever line breaks the source used.
+    """
+    src: str
+    start: int
+    stop: int
+
+    @property
+    def text(self) -> str:
+        txt = self.src[self.start:self.stop]
+        if '\r' in txt:
+            txt = EOL_PAT.sub('\n', txt)
+        return txt + '\n'
+
+    def __str__(self):
+        return self.text
+
 class Chunk(Code):
     """
     Represent a single chunk of text that may be preceded by an "above" (one or more
@@ -125,14 +196,13 @@ class Chunk(Code):
         LIST_VALUE = 2
         TAIL = 3
 
-    above: str 
-    pre: str # leading indent, plus quote char if chunk is quoted
-    chunk: str # the string value as it appears in code
-    interpreted_chunk: str # the string value with escape sequences interpreted
-    divider: str # space after chunk, preceded by quote char if chunk is quoted
-    post: str
-    mode: Mode
-
+    # A chunk is stored in one of two forms. When it comes from a parser, _src is the
+    # text it was parsed from, _at is where pre begins, and _pre, _chunk, _divider and
+    # _post are lengths of consecutive runs of _src. Otherwise (or once any of those
+    # parts is assigned), _src is None and the four parts are strings. Either way,
+    # _above is a str or a TextSpan, and _interpreted caches the decoded value of a
+    # quoted chunk.
+    __slots__ = ('mode', '_src', '_at', '_pre', '_chunk', '_divider', '_post', '_above', '_interpreted')
 
     def __init__(self, mode: Mode, above: str = None, pre: str = None,
                  chunk: str = None, divider: str = None, post: str = None):
@@ -141,12 +211,11 @@ class Chunk(Code):
         
         For quoted chunks, pass chunk with the surrounding quote
         chars; self.pre becomes pre + quote char, self.divider becomes quote char + divider,
-        and self.chunk becomes the inner chunk value with all escape sequences resolved. If
-        post is not None, divider MUST also not be None.
+        and self.chunk becomes the inner chunk value. Escape sequences are resolved when
+        self.interpreted_chunk is first read. If post is not None, divider MUST also not
+        be None.
 
-        If mode is None, it is guessed based on the presence of above, post, and below.
-
-        Raises a ValueError if preconditions are not met, if a quoted chunk has invalid syntax,
+        Raises a ValueError if preconditions are not met, if a quoted chunk is unbalanced,
         or if args don't match mode.
         """
         # Check mode-related preconditions.
@@ -179,48 +248,170 @@ class Chunk(Code):
         if chunk:
             first_char = chunk[0]
             if first_char in '\'"':
-                if chunk[-1] != first_char:
+                if len(chunk) < 2 or chunk[-1] != first_char:
                     raise ValueError("unbalanced quotes on chunk.")
-                self.chunk = chunk[1:-1]
-                try:
-                    self.interpreted_chunk = safe_literal_eval(chunk)
-                except SyntaxWarning as e:
-                    raise ValueError(e)
+                chunk = chunk[1:-1]
                 pre = first_char if pre is None else pre + first_char
                 divider = first_char if divider is None else first_char + divider
-            else:
-                self.interpreted_chunk = self.chunk = chunk
-        else:
-            self.interpreted_chunk = self.chunk = ""
-        self.above = above if above is not None else ""
-        self.pre = pre if pre is not None else ""
-        self.divider = divider if divider is not None else ""
-        self.post = post if post is not None else ""
         self.mode = mode
+        self._src = None
+        self._at = 0
+        self._above = above if above is not None else ""
+        self._pre = pre if pre is not None else ""
+        self._chunk = chunk if chunk is not None else ""
+        self._divider = divider if divider is not None else ""
+        self._post = post if post is not None else ""
+        self._interpreted = None
+
+    @staticmethod
+    def _in_source(mode: Mode, src: str, at: int, pre: int, chunk: int, divider: int,
+                   post: int, above) -> 'Chunk':
+        """
+        Make a chunk from consecutive runs of src, without copying them. The caller
+        vouches that the runs are consistent with mode.
+        """
+        self = Chunk.__new__(Chunk)
+        self.mode = mode
+        self._src = src
+        self._at = at
+        self._interpreted = None
+        if chunk and src[at + pre] in '\'"':
+            # Move the quotes out of the chunk and into pre and divider.
+            q = src[at + pre]
+            if chunk < 2 or src[at + pre + chunk - 1] != q:
+                raise ValueError("unbalanced quotes on chunk.")
+            pre += 1
+            chunk -= 2
+            divider += 1
+            start = at + pre
+            if src.find('\\', start, start + chunk) != -1:
+                # Decode now, so a bad escape is reported by the parse rather than
+                # whenever the value is first used.
+                self._interpreted = decode_quoted(src[start:start + chunk], q)
+        self._pre = pre
+        self._chunk = chunk
+        self._divider = divider
+        self._post = post
+        self._above = above
+        return self
+
+    def _part(self, i: int) -> str:
+        # Return pre, chunk, divider or post (i = 0..3) from whichever form we're in.
+        if self._src is None:
+            return (self._pre, self._chunk, self._divider, self._post)[i]
+        lens = (self._pre, self._chunk, self._divider, self._post)
+        start = self._at + sum(lens[:i])
+        return self._src[start:start + lens[i]]
+
+    def _materialize(self):
+        # Switch to the string form, so that a part can be replaced.
+        if self._src is not None:
+            self._pre, self._chunk, self._divider, self._post = [self._part(i) for i in range(4)]
+            self._src = None
+
+    @property
+    def pre(self) -> str: # leading indent, plus quote char if chunk is quoted
+        return self._part(0)
+
+    @pre.setter
+    def pre(self, value: str):
+        self._materialize()
+        self._pre = value
+
+    @property
+    def chunk(self) -> str: # the string value as it appears in code
+        return self._part(1)
+
+    @chunk.setter
+    def chunk(self, value: str):
+        self._materialize()
+        self._chunk = value
+        self._interpreted = None
+
+    @property
+    def divider(self) -> str: # space after chunk, preceded by quote char if chunk is quoted
+        return self._part(2)
+
+    @divider.setter
+    def divider(self, value: str):
+        self._materialize()
+        self._divider = value
+
+    @property
+    def post(self) -> str:
+        return self._part(3)
+
+    @post.setter
+    def post(self, value: str):
+        self._materialize()
+        self._post = value
+
+    @property
+    def above(self) -> str:
+        above = self._above
+        return above if above.__class__ is str else above.text
+
+    @above.setter
+    def above(self, value: str):
+        self._above = value
+
+    @property
+    def interpreted_chunk(self) -> str:
+        """The string value with escape sequences interpreted."""
+        value = self._interpreted
+        if value is None:
+            value = self.chunk
+            q = self.quote_char
+            if q:
+                # Only decoded values are cached; slicing out a plain one is cheap.
+                value = self._interpreted = decode_quoted(value, q)
+        return value
+
+    def absorb(self, other: 'Chunk'):
+        """
+        Append the code of other to this chunk's post. This is how the text after
+        a key's colon is kept when it turns out to introduce nested content.
+        """
+        if (self._src is not None and other._src is self._src and not other._above and
+                other._at == self._at + self._pre + self._chunk + self._divider + self._post):
+            self._post += other._pre + other._chunk + other._divider + other._post
+        else:
+            self.post += other.code
 
     @property
     def quote_char(self):
         """Returns the quote character encompassing the chunk, if any."""
-        return self.pre[-1] if self.pre[-1] in '\'"' else None
+        q = self.pre[-1:]
+        return q if q and q in '\'"' else None
 
     @property
     def is_empty(self):
-        if self.chunk or self.above or self.pre or self.divider or self.post or self.interpreted_chunk:
+        if self.chunk or self.above or self.pre or self.divider or self.post:
             return False
         return True
 
     @staticmethod
     def from_dictkey(line: str, above: str = ""):
-        end_of_indent, end_of_first_text = first_two_tokens(line)
-        pre = line[:end_of_indent]
-        i = line.find(":", end_of_first_text)
+        return Chunk.from_source_key(line, 0, len(line), above)
+
+    @staticmethod
+    def from_source_key(src: str, start: int, end: int, above="", text_start: int = None):
+        """
+        Make a DICT_KEY chunk from src[start:end], which must contain the key's colon.
+        The key's text begins at text_start, which defaults to the first non-space
+        char; anything before it (indent, and maybe a list item bullet) becomes pre.
+        """
+        if text_start is None:
+            text_start, end_of_first_text = first_two_tokens(src, start, end)
+        else:
+            _, end_of_first_text = first_two_tokens(src, text_start, end)
+        i = src.find(":", end_of_first_text, end)
         if i == -1:
             raise ValueError("No : found in line.")
         # divider should be any spaces before :, plus the : char itself
-        start_of_divider = start_of_space_before(line, i)
-        divider = line[start_of_divider:i+1]
-        token = line[end_of_indent:start_of_divider]
-        return Chunk(above=above, pre=pre, chunk=token, divider=divider, mode=Chunk.Mode.DICT_KEY)
+        start_of_divider = start_of_space_before(src, i, text_start)
+        return Chunk._in_source(Chunk.Mode.DICT_KEY, src, start, text_start - start,
+                                start_of_divider - text_start, i + 1 - start_of_divider, 0, above)
 
     @staticmethod
     def from_dictvalue(line: str):
@@ -248,28 +439,36 @@ class Chunk(Code):
         If mode == LIST_VALUE, pre is the indent, chunk is the value, and we might have
         divider+post (space before comment, comment).
         """
+        return Chunk.from_source_value(mode, line, 0, len(line), above)
+
+    @staticmethod
+    def from_source_value(mode: Mode, src: str, start: int, end: int, above="", text_start: int = None):
+        """
+        Like _from_value(), but for the line src[start:end], which is not copied. The
+        value's text begins at text_start, which defaults to the first non-space char;
+        anything before it (e.g., the indent and bullet of a list item) becomes pre.
+        """
         if mode not in [Chunk.Mode.DICT_VALUE, Chunk.Mode.LIST_VALUE]:
             raise ValueError(f"Invalid mode {mode}.")
-        end_of_indent, end_of_first_text = first_two_tokens(line)
-        pre = line[:end_of_indent]
-        i = line.find("#", end_of_first_text)
+        if text_start is None:
+            text_start, end_of_first_text = first_two_tokens(src, start, end)
+        else:
+            _, end_of_first_text = first_two_tokens(src, text_start, end)
+        i = src.find("#", end_of_first_text, end)
         if i == -1:
             # divider should be any spaces between the end of the value and the end of line
-            start_of_divider = start_of_space_before(line, len(line))
-            divider = line[start_of_divider:]
-            token = line[end_of_indent:start_of_divider]
-            return Chunk(above=above, pre=pre, chunk=token, divider=divider, mode=mode)
-        else:
-            # divider should be any spaces between the end of the value and the # of the comment
-            start_of_divider = start_of_space_before(line, i)
-            divider = line[start_of_divider:i]
-            token = line[end_of_indent:start_of_divider]
-            return Chunk(above=above, pre=pre, chunk=token, divider=divider, post=line[i:], mode=mode)
+            i = end
+        # else divider should be any spaces between the end of the value and the # of the comment
+        start_of_divider = max(start_of_space_before(src, i, start), end_of_first_text)
+        return Chunk._in_source(mode, src, start, text_start - start, start_of_divider - text_start,
+                                i - start_of_divider, end - i, above)
         
     @property
     def code(self):
         # Return the chunk and all its surrounding text, as it appears in code.
-        return self.above + self.pre + self.chunk + self.divider + self.post
+        if self._src is not None:
+            return self.above + self._src[self._at:self._at + self._pre + self._chunk + self._divider + self._post]
+        return self.above + self._pre + self._chunk + self._divider + self._post
 
     def __str__(self):
         # Return the chunk by itself, disregarding all other properties,
@@ -294,25 +493,138 @@ class Chunk(Code):
         return self.interpreted_chunk < other.interpreted_chunk  # Compare based on the `data` attribute.
 
 class List(Code, list):
+    # When this list is itself a list item introduced by a bare "-" line, the
+    # chunk that holds that line (and any comments above it).
+    head: Chunk = None
+
     @property
     def code(self) -> str:
         """
         Returns a string representation of the list, including comments.
         """
-        txt = "\n".join(item.code if isinstance(item, Chunk) else str(item) for item in self)
-        txt = guarantee_non_empty_ends_with_new_line(txt)
-        return txt
+        parts = []
+        write_code(self, parts.append)
+        return ''.join(parts)
 
 class Dict(Code, dict):
+    # When this dict is itself a list item introduced by a bare "-" line, the
+    # chunk that holds that line (and any comments above it).
+    head: Chunk = None
+
     @property
     def code(self) -> str:
         """
         Returns a string representation of the dict, including comments.
         """
-        lines = []
-        for key, value in self.items():
-            ktext = key.code if isinstance(key, Chunk) else key
-            lines.append(f"{ktext}: {value.code if isinstance(value, Chunk) else value}")
-        txt = "\n".join(lines)
-        txt = guarantee_non_empty_ends_with_new_line(txt)
-        return txt
+        parts = []
+        write_code(self, parts.append)
+        return ''.join(parts)
+
+# Chars that can't appear in an unquoted scalar, or that need escaping inside a quoted one.
+UNSAFE_CHARS_PAT = re.compile(r'[\x00-\x1f\x7f:#"\'\\]')
+ESCAPES = {'\\': '\\\\', '\n': '\\n', '\r': '\\r', '\t': '\\t',
+           '"': '\\x22', ':': '\\x3a', '#': '\\x23'}
+
+def _escape(match) -> str:
+    c = match.group()
+    return ESCAPES.get(c) or f'\\x{ord(c):02x}'
+
+def scalar_code(value) -> str:
+    """
+    Return the code for a plain python scalar, quoting and escaping strings
+    when they would otherwise be misread (as a null, bool, number or date; as
+    a list item; or because they contain :, #, quotes or control chars).
+    """
+    if value is None:
+        return serialize_null()
+    if isinstance(value, bool):
+        return serialize_bool(value)
+    if isinstance(value, int):
+        return serialize_int(value)
+    if isinstance(value, float):
+        return serialize_float(value)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return serialize_date(value)
+    if isinstance(value, Chunk):
+        return value.code
+    if not isinstance(value, str):
+        raise ValueError(f"Can't serialize {type(value).__name__} value {value!r}.")
+    if (value and value.strip(' ') == value and value[0] != '-'
+            and not UNSAFE_CHARS_PAT.search(value) and classify_and_deserialize(value)[0] == STR):
+        return value
+    return '"' + UNSAFE_CHARS_PAT.sub(_escape, value) + '"'
+
+def _is_container(value) -> bool:
+    return isinstance(value, (dict, list, tuple))
+
+class _Frame:
+    """A container that write_code() is partway through writing."""
+    __slots__ = ('entries', 'indent', 'is_list', 'bullet')
+
+    def __init__(self, container, indent: int, bullet: str = None):
+        self.is_list = not isinstance(container, dict)
+        self.entries = iter(container) if self.is_list else iter(container.items())
+        self.indent = indent  # what plain (not parsed) entries get
+        self.bullet = bullet  # replaces the indent of the first key, for a dict in a list
+
+def write_code(node, write) -> None:
+    """
+    Write the code for a container (or a chunk) and everything nested in it by
+    calling write() with successive pieces of text, in one walk of the tree.
+    Anything that came from a parser carries its own indent, bullets and comments
+    and is reproduced exactly. Plain python dicts, lists and scalars are laid out
+    with 2-space indents at the depth where they appear. (An empty plain
+    container has no syntax of its own, so it comes back as an empty value.)
+
+    The walk uses an explicit stack rather than recursion, so arbitrarily deep
+    trees can be written.
+    """
+    if not _is_container(node):
+        write(node.code if isinstance(node, Chunk) else scalar_code(node) + '\n')
+        return
+    stack = [_Frame(node, 0)]
+    end = object()
+    while stack:
+        frame = stack[-1]
+        entry = next(frame.entries, end)
+        if entry is end:
+            stack.pop()
+        else:
+            nested = _write_item(entry, frame, write) if frame.is_list else \
+                _write_dict_entry(entry[0], entry[1], frame, write)
+            if nested:
+                stack.append(nested)
+
+def _write_item(value, frame: _Frame, write) -> _Frame:
+    indent = frame.indent
+    if isinstance(value, Chunk):
+        write(value.above if value.mode == Chunk.Mode.TAIL else value.code + '\n')
+    elif not _is_container(value):
+        write(' ' * indent + '- ' + scalar_code(value) + '\n')
+    elif getattr(value, 'head', None) is not None:
+        write(value.head.code + '\n')
+        return _Frame(value, indent + 2)
+    elif not value:
+        write(' ' * indent + '-\n')
+    elif isinstance(value, Dict):
+        # A parsed dict keeps the "- " of its list item in the pre of its first key.
+        return _Frame(value, indent + 2)
+    elif isinstance(value, dict):
+        return _Frame(value, indent + 2, bullet=' ' * indent + '- ')
+    else:
+        write(' ' * indent + '-\n')
+        return _Frame(value, indent + 2)
+
+def _write_dict_entry(key, value, frame: _Frame, write) -> _Frame:
+    if key is None and isinstance(value, Chunk) and value.mode == Chunk.Mode.TAIL:
+        write(value.above)
+        return None
+    if isinstance(key, Chunk):
+        write(key.code)
+    else:
+        write((frame.bullet or ' ' * frame.indent) + scalar_code(key) + ':')
+    frame.bullet = None
+    if _is_container(value):
+        write('\n')
+        return _Frame(value, frame.indent + 2) if value else None
+    write((value.code if isinstance(value, Chunk) else ' ' + scalar_code(value)) + '\n')
@@ -30,10 +30,10 @@ def deserialize_null(txt):
 def serialize_null(_=None) -> str:
     return "null"
 
-DEC_INT_PAT = re.compile(r"^([-+]?)[0-9](_?[0-9]+)*$")
-HEX_INT_PAT = re.compile(r"^([-+]?)0x[0-9a-fA-F](_?[0-9a-fA-F]+)*$")
-BIN_INT_PAT = re.compile(r"^([-+]?)0b[01](_?[01]+)*$")
-OCT_INT_PAT = re.compile(r"^([-+]?)0o[0-9](_?[0-7]+)*$")
+DEC_INT_PAT = re.compile(r"^([-+]?)[0-9]+(_[0-9]+)*$")
+HEX_INT_PAT = re.compile(r"^([-+]?)0x[0-9a-fA-F]+(_[0-9a-fA-F]+)*$")
+BIN_INT_PAT = re.compile(r"^([-+]?)0b[01]+(_[01]+)*$")
+OCT_INT_PAT = re.compile(r"^([-+]?)0o[0-7]+(_[0-7]+)*$")
 
 def is_int(txt) -> bool:
     if DEC_INT_PAT.match(txt): return True
@@ -46,11 +46,11 @@ def deserialize_int(txt: str):
     m = DEC_INT_PAT.match(txt)
     if m: return int(txt.replace("_", ""))
     m = HEX_INT_PAT.match(txt)
-    if m: return int(txt[2:].replace("_", ""), 16)
+    if m: return int(txt.replace("_", ""), 16)
     m = BIN_INT_PAT.match(txt)
-    if m: return int(txt[2:].replace("_", ""), 2)
+    if m: return int(txt.replace("_", ""), 2)
     m = OCT_INT_PAT.match(txt)
-    if m: return int(txt[2:].replace("_", ""), 8)
+    if m: return int(txt.replace("_", ""), 8)
     raise ValueError(f"Invalid int value: {txt}")
 
 def serialize_int(n, base: int=10) -> str:
@@ -88,20 +88,104 @@ def deserialize_float(txt: str):
 def serialize_float(n, base: int=10) -> str:
     if math.isinf(n): 
         return "-.inf" if n < 0 else ".inf"
-    elif math.nan(n):
+    elif math.isnan(n):
         return ".nan"
     else:
         return str(n)
     
-def is_date(txt) -> bool:
+# An explicit tag for a timestamp, as in the space.i that Space.init writes.
+TIMESTAMP_TAG = '!!timestamp'
+
+# The shapes dates and timestamps usually take, which datetime.fromisoformat parses.
+ISO_DATETIME_PAT = re.compile(r"^\d{4}-\d{2}-\d{2}(?:[Tt ]\d{2}:\d{2}(?::\d{2}(?:[.,]\d+)?)?(?:[zZ]|[-+]\d{2}(?::?[0-5]\d)?)?)?$")
+# The rarer shapes worth handing to dateutil's isoparse: a year, more of the date
+# (maybe a week or ordinal date), and maybe a separator char followed by a time
+# and a time zone. isoparse also accepts stray whitespace and junk in odd places,
+# but text like that isn't taken for a date.
+ISO_LIKE_PAT = re.compile(r"^\d{4}[-0-9W]*(?:.[-+0-9:.,zZ]*)?$")
+
+def parse_date(txt: str):
+    """
+    Return the datetime for an ISO 8601 date or timestamp, which may be tagged
+    !!timestamp, or None if txt isn't one. Common shapes are parsed with
+    datetime.fromisoformat; dateutil is only tried for rarer ones (week dates,
+    24:00, and so on), and text that can't be a date is rejected by a regex.
+    """
+    if txt.startswith(TIMESTAMP_TAG):
+        txt = txt[len(TIMESTAMP_TAG):].lstrip(' ')
+    if ISO_DATETIME_PAT.match(txt):
+        try:
+            return datetime.datetime.fromisoformat(txt)
+        except ValueError:
+            pass  # out of range, or a form only dateutil accepts
+    elif not ISO_LIKE_PAT.match(txt):
+        return None
     try:
-        dateutil.parser.isoparse(txt)
-        return True
+        return dateutil.parser.isoparse(txt)
     except ValueError:
-        return False
+        return None
+
+def is_date(txt) -> bool:
+    return parse_date(txt) is not None
     
 def deserialize_date(txt: str):
-    return dateutil.parser.isoparse(txt)
+    value = parse_date(txt)
+    if value is None: raise ValueError(f"Invalid date value: {txt}")
+    return value
 
 def serialize_date(date) -> str:
     return date.isoformat()
+
+NULL, BOOL, INT, FLOAT, DATE, STR = 'null', 'bool', 'int', 'float', 'date', 'str'
+
+# Every word that BOOL_PAT or NULL_PAT accepts, with its kind and value.
+_WORDS = {'~': (NULL, None)}
+for _word, _value in [('null', None), ('true', True), ('false', False), ('on', True),
+                      ('off', False), ('yes', True), ('no', False)]:
+    for _variant in (_word, _word.capitalize(), _word.upper()):
+        _WORDS[_variant] = (NULL if _value is None else BOOL, _value)
+
+# The int and float patterns above, as one alternation.
+NUMBER_PAT = re.compile(r"""
+    (?P<dec>[-+]?[0-9]+(?:_[0-9]+)*)$
+  | (?P<hex>[-+]?0x[0-9a-fA-F]+(?:_[0-9a-fA-F]+)*)$
+  | (?P<bin>[-+]?0b[01]+(?:_[01]+)*)$
+  | (?P<oct>[-+]?0o[0-7]+(?:_[0-7]+)*)$
+  | (?P<float>[-+]?(?:[0-9]*\.[0-9]+|[0-9]+\.?)(?:[eE][-+]?(?P<exp>[0-9]+))?)$
+  | (?P<inf>[-+]?\.inf)$
+  | (?P<nan>\.nan)$
+""", re.VERBOSE)
+
+_NUMBER_LEADS = frozenset('0123456789+-.')
+_INT_BASES = {'hex': 16, 'bin': 2, 'oct': 8}
+
+def classify_and_deserialize(txt: str) -> tuple:
+    """
+    Return (kind, value) for a plain scalar, where kind is NULL, BOOL, INT, FLOAT,
+    DATE or STR (the value is then txt itself). Agrees with the is_* checks above,
+    tried in that order, but looks at the first character to pick the few checks
+    that could succeed, and matches numbers with a single regex.
+    """
+    hit = _WORDS.get(txt)
+    if hit:
+        return hit
+    if txt and txt[0] in _NUMBER_LEADS:
+        m = NUMBER_PAT.match(txt)
+        if m:
+            kind = m.lastgroup
+            if kind == 'dec':
+                return INT, int(txt.replace("_", ""))
+            if kind in _INT_BASES:
+                return INT, int(txt.replace("_", ""), _INT_BASES[kind])
+            if kind == 'float':
+                exponent = m.group('exp')
+                if exponent is None or int(exponent) <= 308:
+                    return FLOAT, float(txt)
+            if kind == 'inf':
+                return FLOAT, float('-inf') if txt[0] == '-' else float('inf')
+            if kind == 'nan':
+                return FLOAT, float('nan')
+    value = parse_date(txt)
+    if value is not None:
+        return DATE, value
+    return STR, txt
@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from ..lang.parts.util import temp_folder
+
+# Modules that quick commands shouldn't pay to import.
+HEAVY = ['rich', 'rich_argparse', 'pathspec', 'socket', 'selectors', 'ctypes', 'concurrent.futures']
+
+# Generous, so slow machines pass; eagerly importing rich, pathspec and the server
+# on top of what's needed blows it.
+BUDGET_MICROSECONDS = 200_000
+
+def import_times(*argv):
+    """
+    Run the CLI with argv under -X importtime; return {module: cumulative microseconds},
+    and the total over top-level imports.
+    """
+    code = f"import sys; sys.argv = {['i', *argv]!r}; from intent.app import main; main()"
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True, check=True)
+    times, total = {}, 0
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line.split('|')
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+                # Nested imports are indented beyond the single leading space.
+                if not name.startswith('  '):
+                    total += int(cumulative)
+    return times, total
+
+@pytest.mark.parametrize('argv', [['--version'], ['root']])
+def test_quick_commands_import_little(argv):
+    times, total = import_times(*argv)
+    assert 'intent.app' in times
+    for name in HEAVY:
+        assert name not in times, f'{name} imported by i {" ".join(argv)}'
+    assert total < BUDGET_MICROSECONDS
+
+def test_ui_is_still_importable_from_app():
+    from intent.app import ui
+    assert hasattr(ui, 'err')
+
+def test_timings_and_profile(temp_folder):
+    import pstats
+    stats = os.path.join(temp_folder.path, 'stats')
+    code = f"import sys; sys.argv = ['i', '--timings', '--profile', {stats!r}, 'root']; from intent.app import main; main()"
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    assert result.stderr.splitlines()[-1].startswith('total ')
+    assert pstats.Stats(stats).total_calls > 0
@@ -0,0 +1,34 @@
+import os
+import socket
+import threading
+import pytest
+
+from intent.app.serve import Server, request, socket_path
+from intent.lang.parts import Space
+
+from ..lang.parts.util import temp_folder, write
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason='needs unix sockets')
+
+def test_request_without_server(temp_folder):
+    assert request(temp_folder.path, 'ping') is None
+
+def test_serve_compile_and_stop(temp_folder):
+    space = Space.init(temp_folder.path)
+    write(space.rel_path_to_abs('a.i'), 'a: 1\n')
+    server = Server(space.path)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        assert request(space.path, 'compile') == {'ok': True, 'modules': 2, 'problems': []}
+        write(space.rel_path_to_abs('bad.i'), 'a: b\n\tc: d\n')
+        response = request(space.path, 'compile')
+        assert response['modules'] == 2 and 'bad.i' in response['problems'][0]
+        assert request(space.path, 'bogus')['ok'] is False
+        with pytest.raises(ValueError):
+            Server(space.path)
+    finally:
+        assert request(space.path, 'stop') == {'ok': True}
+        thread.join(5)
+    assert not thread.is_alive()
+    assert not os.path.exists(socket_path(space.path))
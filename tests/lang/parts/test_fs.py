@@ -1,5 +1,7 @@
 import os
-from intent.lang.parts.fs import canonical_path, enforced_canonical_folder, folders_back_to_root
+from intent.lang.parts.fs import canonical_path, enforced_canonical_folder, folders_back_to_root, \
+    join_canonical, relative_canonical, reset_path_cache
+import pytest
 
 from .util import temp_folder
 
@@ -33,6 +35,29 @@ def test_canonical_path_trailing_sep():
     expected = os.path.abspath(path.rstrip(os.path.sep))
     assert canonical_path(path) == expected
     
+def test_canonical_path_cwd_captured_until_reset(temp_folder, monkeypatch):
+    reset_path_cache()
+    before = canonical_path('x.txt')
+    monkeypatch.chdir(temp_folder.path)
+    assert canonical_path('x.txt') == before
+    reset_path_cache()
+    try:
+        assert canonical_path('x.txt') == os.path.join(os.getcwd(), 'x.txt')
+    finally:
+        monkeypatch.undo()
+        reset_path_cache()
+
+def test_join_canonical():
+    assert join_canonical('/a/b', 'c.i') == '/a/b/c.i'
+    assert join_canonical('/', 'c.i') == '/c.i'
+
+def test_relative_canonical():
+    assert relative_canonical('/a/b/c/d.i', '/a/b') == 'c/d.i'
+    assert relative_canonical('/a/b', '/a/b') == '.'
+    assert relative_canonical('/a/b', '/') == 'a/b'
+    with pytest.raises(ValueError):
+        relative_canonical('/a/bc', '/a/b')
+
 def test_enforced_canonical_folder_on_existing_folder():
     # Test case 1: Path is a folder
     path = os.path.dirname(__file__)
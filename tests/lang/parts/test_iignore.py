@@ -1,12 +1,14 @@
 import os
 import pytest
 
-from .util import DATA_DIR
+from .util import DATA_DIR, temp_folder, write
 IIGNORE_DIR = os.path.join(DATA_DIR, 'iignore')
 IIGNORE_NOIGNORES_DIR = os.path.join(IIGNORE_DIR, 'noignores')
 IIGNORE_SOMEIGNORES_DIR = os.path.join(IIGNORE_DIR, 'someignores')
 
 from intent.lang.parts import Space, HierarchicalDotIIgnore
+from intent.lang.parts.iignore import DotIIgnore
+from intent.lang.parts.fs import reset_path_cache
 
 @pytest.fixture
 def iignore():
@@ -39,3 +41,110 @@ def test_iignore(iignore):
         for item, ignored in results:
             ok = check(item, ignored) and ok
     assert ok
+
+def test_folder_state_caches_chain_and_prunes(iignore):
+    nested = os.path.join(IIGNORE_DIR, 'nested')
+    state = iignore.folder_state(os.path.join(nested, 'includedsubdir'))
+    assert [os.path.dirname(i.path) for i in state.chain] == [os.path.join(nested, 'includedsubdir'), nested]
+    assert not state.ignored
+    assert iignore.is_ignored_folder(os.path.join(nested, 'ignoredsubdir'))
+    # Anything below an ignored folder is ignored, without consulting patterns.
+    assert iignore.test_path(os.path.join(nested, 'ignoredsubdir', 'deeper', 'x.md')) is True
+    assert iignore.folder_state(os.path.dirname(IIGNORE_DIR)) is None
+    assert iignore.test_path(os.path.join(os.path.dirname(IIGNORE_DIR), 'x.txt')) is False
+
+def test_refresh_picks_up_changed_iignore(temp_folder):
+    root = temp_folder.path
+    with open(os.path.join(root, '.iignore'), 'wt') as f:
+        f.write('*.txt\n')
+    h = HierarchicalDotIIgnore(root)
+    assert h.test_path(os.path.join(root, 'a.txt')) is True
+    with open(os.path.join(root, '.iignore'), 'wt') as f:
+        f.write('*.md\n')
+    os.utime(os.path.join(root, '.iignore'), (1, 1))
+    # Decisions aren't rechecked until a refresh.
+    assert h.test_path(os.path.join(root, 'a.txt')) is True
+    h.refresh()
+    assert h.test_path(os.path.join(root, 'a.txt')) is None
+    assert h.test_path(os.path.join(root, 'a.md')) is True
+
+def test_testing_one_path_only_checks_its_folders(temp_folder, monkeypatch):
+    root = temp_folder.path
+    for i in range(20):
+        os.makedirs(os.path.join(root, f'big{i}', 'x', 'y'))
+    deep = os.path.join(root, 'a', 'b', 'c')
+    os.makedirs(deep)
+    with open(os.path.join(root, 'a', '.iignore'), 'wt') as f:
+        f.write('*.log\n')
+    h = HierarchicalDotIIgnore(root)
+    checked = []
+    real = os.path.isfile
+    monkeypatch.setattr(os.path, 'isfile', lambda p: checked.append(p) or real(p))
+    monkeypatch.setattr(os, 'walk', None)
+    monkeypatch.setattr(os, 'scandir', None)
+    assert h.test_path(os.path.join(deep, 'x.log')) is True
+    assert len(checked) == 4  # root, a, b, c
+    # Negative answers are cached too.
+    assert h.test_path(os.path.join(deep, 'x.md')) is None
+    assert len(checked) == 4
+
+def test_parse_rule_fast_paths():
+    from intent.lang.parts.iignore import parse_rule, NAME, DIR_NAME, SUFFIX, REGEX
+    assert parse_rule('node_modules/\n')[:3] == (DIR_NAME, 'node_modules', True)
+    assert parse_rule('Thumbs.db')[:3] == (NAME, 'Thumbs.db', True)
+    assert parse_rule('*.log')[:3] == (SUFFIX, '.log', True)
+    assert parse_rule('!*.i')[:3] == (SUFFIX, '.i', False)
+    assert parse_rule('*.py[cod]').kind == REGEX
+    assert parse_rule('/build').kind == REGEX
+    assert parse_rule('# comment') is None
+    assert parse_rule('') is None
+
+def test_matcher_last_match_wins_across_levels(temp_folder):
+    from intent.lang.parts.iignore import EMPTY_MATCHER, parse_rule
+    rules = lambda *lines: [parse_rule(line) for line in lines]
+    root = temp_folder.path
+    sub = os.path.join(root, 'sub')
+    m = EMPTY_MATCHER.extend(root, rules('*.log', '!keep.log', 'x*'))
+    assert m.test(os.path.join(root, 'a.log')) is True
+    assert m.test(os.path.join(root, 'keep.log')) is False
+    assert m.test(os.path.join(root, 'x.log')) is True
+    assert m.test(os.path.join(root, 'a.md')) is None
+    m = m.extend(sub, rules('!*.log', 'build/'))
+    assert m.test(os.path.join(sub, 'x.log')) is False
+    assert m.test(os.path.join(sub, 'build'), True) is True
+    assert m.test(os.path.join(sub, 'build')) is None
+
+def test_anchored_patterns_are_relative_to_their_iignore(temp_folder):
+    root = temp_folder.path
+    sub = os.path.join(root, 'sub')
+    os.makedirs(os.path.join(sub, 'gen'))
+    os.makedirs(os.path.join(root, 'gen'))
+    with open(os.path.join(sub, '.iignore'), 'wt') as f:
+        f.write('/gen\na/b.txt\n')
+    h = HierarchicalDotIIgnore(root)
+    assert h.is_ignored_folder(os.path.join(sub, 'gen'))
+    assert not h.is_ignored_folder(os.path.join(root, 'gen'))
+    assert h.test_path(os.path.join(sub, 'a', 'b.txt')) is True
+    assert h.test_path(os.path.join(sub, 'c', 'a', 'b.txt')) is None
+
+def test_test_paths_matches_test_path(iignore, monkeypatch, request):
+    paths = []
+    for root, dirs, files in os.walk(IIGNORE_DIR):
+        paths.extend(os.path.join(root, item) for item in dirs + files)
+    monkeypatch.chdir(IIGNORE_DIR)
+    reset_path_cache()
+    request.addfinalizer(reset_path_cache)
+    relative = [os.path.relpath(p) for p in paths] + ['./nested/ignored.txt', 'nested/../included/included.txt', '/', 'x.txt']
+    expected = [(p, iignore.test_path(p)) for p in paths + relative]
+    results = iignore.test_paths(iter(paths + relative))
+    assert not isinstance(results, list)
+    assert list(results) == expected
+    assert list(iignore.filter_paths(paths)) == [p for p, r in expected[:len(paths)] if r is not True]
+
+def test_spec_is_only_built_when_asked_for(temp_folder):
+    path = os.path.join(temp_folder.path, '.iignore')
+    write(path, '*.txt\n!keep.txt\n')
+    d = DotIIgnore(path)
+    assert d.test_path(os.path.join(temp_folder.path, 'a.txt')) is True
+    assert d._spec is None
+    assert d.spec.match_file('a.txt') and not d.spec.match_file('keep.txt')
@@ -0,0 +1,79 @@
+import os
+import pickle
+
+from intent.lang.parts import Module, Space
+from intent.lang.parts.parse_cache import ParseCache
+from intent.lang.serde import load
+
+from .util import temp_folder, write
+
+DOC = '''# fruit
+apple:
+  color: red
+pear: green
+'''
+
+def test_cached_tree_matches_load(temp_folder):
+    path = os.path.join(temp_folder.path, 'a.i')
+    write(path, DOC, age=10)
+    cache = ParseCache(os.path.join(temp_folder.path, 'cache'))
+    first = cache.load(path)
+    assert first == load(DOC)
+    cache.save()
+    again = ParseCache(cache.folder).load(path)
+    assert again == first
+    assert again.code == DOC
+
+def test_unchanged_stamp_skips_reading(temp_folder, monkeypatch):
+    path = os.path.join(temp_folder.path, 'a.i')
+    write(path, DOC, age=10)
+    cache = ParseCache(os.path.join(temp_folder.path, 'cache'))
+    cache.load(path)
+    cache.save()
+    cache = ParseCache(cache.folder)
+    monkeypatch.setattr(ParseCache, 'digest', None)
+    assert cache.load(path).code == DOC
+
+def test_changed_file_is_reparsed(temp_folder):
+    path = os.path.join(temp_folder.path, 'a.i')
+    write(path, DOC, age=10)
+    cache = ParseCache(os.path.join(temp_folder.path, 'cache'))
+    cache.load(path)
+    write(path, DOC.replace('green', 'yellow'), age=5)
+    assert str(cache.load(path)['pear']) == 'yellow'
+
+def test_recent_file_is_rehashed(temp_folder):
+    path = os.path.join(temp_folder.path, 'a.i')
+    write(path, DOC, age=0)
+    cache = ParseCache(os.path.join(temp_folder.path, 'cache'))
+    cache.load(path)
+    assert cache.index[path][0] == 0
+
+def test_corrupt_entry_is_a_miss(temp_folder):
+    path = os.path.join(temp_folder.path, 'a.i')
+    write(path, DOC, age=10)
+    cache = ParseCache(os.path.join(temp_folder.path, 'cache'))
+    cache.load(path)
+    digest = cache.index[path][2]
+    with open(cache._entry_path(digest), 'wb') as f:
+        f.write(b'junk')
+    assert cache.load(path) == load(DOC)
+    with open(cache._entry_path(digest), 'rb') as f:
+        assert pickle.load(f) == load(DOC)
+
+def test_module_compile_uses_space_cache(temp_folder):
+    space = Space.init(temp_folder.path)
+    path = space.rel_path_to_abs('a.i')
+    write(path, DOC, age=10)
+    ast, problem = Module(path, space).compile()
+    assert problem is None
+    assert ast == load(DOC)
+    assert path in space.parse_cache.index
+    assert space.parse_cache.folder.startswith(space.rel_path_to_abs('out'))
+
+def test_module_compile_reports_problem(temp_folder):
+    path = os.path.join(temp_folder.path, 'bad.i')
+    write(path, 'a: b\n\tc: d\n', age=10)
+    ast, problem = Module(path).compile()
+    assert ast is None
+    assert 'bad.i' in problem
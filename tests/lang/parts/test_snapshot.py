@@ -0,0 +1,54 @@
+import os
+
+from intent.lang.parts import Space
+from intent.lang.parts.snapshot import DirSnapshot, Listing, list_folder
+
+from .util import backdate, temp_folder, write
+
+def test_list_folder(temp_folder):
+    root = temp_folder.path
+    write(os.path.join(root, 'b.i'))
+    write(os.path.join(root, 'a.i'))
+    write(os.path.join(root, 'notes.txt'))
+    write(os.path.join(root, '.iignore'), '*.txt\n')
+    write(os.path.join(root, 'sub', 'c.i'))
+    assert list_folder(root) == Listing(('sub',), ('a.i', 'b.i'), True)
+    assert list_folder(os.path.join(root, 'missing')) is None
+
+def test_snapshot_only_relists_changed_folders(temp_folder, monkeypatch):
+    root = temp_folder.path
+    write(os.path.join(root, 'a.i'))
+    write(os.path.join(root, 'sub', 'b.i'))
+    backdate(root, os.path.join(root, 'sub'))
+    path = os.path.join(root, 'snap')
+    snap = DirSnapshot(path)
+    assert snap.listing(root).dirs == ('sub',)
+    snap.listing(os.path.join(root, 'sub'))
+    snap.save()
+    listed = []
+    import intent.lang.parts.snapshot as snapshot_module
+    real = snapshot_module.list_folder
+    monkeypatch.setattr(snapshot_module, 'list_folder', lambda folder: listed.append(folder) or real(folder))
+    snap = DirSnapshot(path)
+    assert snap.listing(os.path.join(root, 'sub')).modules == ('b.i',)
+    assert listed == []
+    write(os.path.join(root, 'sub', 'c.i'))
+    assert snap.listing(os.path.join(root, 'sub')).modules == ('b.i', 'c.i')
+    assert listed == [os.path.join(root, 'sub')]
+    snap.save()
+    # Only folders seen in this session are kept.
+    assert list(DirSnapshot(path).folders) == [os.path.join(root, 'sub')]
+
+def test_space_modules_and_iignores_from_snapshot(temp_folder):
+    space = Space.init(temp_folder.path)
+    write(space.rel_path_to_abs('a.i'))
+    write(space.rel_path_to_abs('src/b.i'))
+    write(space.rel_path_to_abs('src/skip.i'))
+    write(space.rel_path_to_abs('src/.iignore'), 'skip.i\n')
+    expected = [m.sid for m in space.modules()]
+    assert expected == ['/a', '/space', '/src/b']
+    space.compile()
+    warm = Space(space.path)
+    assert [m.sid for m in warm.modules(snapshot=True)] == expected
+    assert sorted(warm.iignore.iignores) == [space.path, space.rel_path_to_abs('src')]
+    assert os.path.isfile(space.rel_path_to_abs('out/dir_snapshot'))
@@ -1,10 +1,12 @@
 import os
 import pytest
 import shutil
+import threading
 
-from intent.lang.parts import Space, HierarchicalDotIIgnore
+from intent.lang.parts import Module, Space, HierarchicalDotIIgnore
+from intent.lang.parts.timings import start_timings, stop_timings
 
-from .util import DATA_DIR, SPACE1_DIR, temp_folder
+from .util import DATA_DIR, SPACE1_DIR, backdate, temp_folder
 
 @pytest.fixture
 def space1():
@@ -64,3 +66,158 @@ def test_init_below_git_repo_root_succeeds_with_force(temp_folder):
     for item in ITEMS_CREATED_DURING_INIT:
         assert os.path.exists(os.path.join(subdir, item))
 
+def test_find_root_caches_each_folder_visited(temp_folder, monkeypatch):
+    space = Space.init(temp_folder.path)
+    deep = os.path.join(space.path, 'a', 'b', 'c')
+    os.makedirs(deep)
+    checked = []
+    is_space = Space.is_space
+    monkeypatch.setattr(Space, 'is_space', staticmethod(lambda p: checked.append(p) or is_space(p)))
+    assert Space.find_root(deep) == space.path
+    assert len(checked) == 4
+    module = os.path.join(space.path, 'a', 'x.i')
+    with open(module, 'wt') as f:
+        f.write('x: 1\n')
+    assert Space.find_root(module) == space.path
+    assert Space.find_root(os.path.join(deep, 'd')) == space.path
+    assert checked[4:] == [os.path.join(deep, 'd')]
+    outside = os.path.dirname(space.path)
+    assert Space.find_root(outside) is None
+    del checked[:]
+    assert Space.find_root(outside) is None
+    assert checked == []
+
+def _space_with_modules(folder, count):
+    space = Space.init(folder)
+    for i in range(count):
+        sub = os.path.join(folder, f'pkg{i % 3}')
+        os.makedirs(sub, exist_ok=True)
+        with open(os.path.join(sub, f'm{i}.i'), 'wt') as f:
+            f.write(f'# module {i}\nname: m{i}\nitems:\n  - {i}\n  - x\n')
+    with open(os.path.join(folder, 'bad.i'), 'wt') as f:
+        f.write('a: b\n\tc: d\n')
+    return space
+
+def test_parallel_compile_matches_serial(temp_folder):
+    space = _space_with_modules(temp_folder.path, 12)
+    serial = Space(space.path).compile()
+    parallel = Space(space.path).compile(jobs=3)
+    assert [a.code for a in parallel[0]] == [a.code for a in serial[0]]
+    assert parallel[1] == serial[1]
+    assert len(serial[0]) == 13  # 12 modules plus space.i
+    assert len(serial[1]) == 1 and 'bad.i' in serial[1][0]
+
+def test_parallel_compile_fills_parent_cache_index(temp_folder):
+    space = _space_with_modules(temp_folder.path, 4)
+    space.compile(jobs=2)
+    reloaded = Space(space.path).parse_cache
+    assert sorted(reloaded.index) == sorted(m.path for m in space.modules())
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_compile_records_timings(temp_folder, jobs):
+    space = _space_with_modules(temp_folder.path, 4)
+    timings = start_timings()
+    try:
+        Space(space.path).compile(jobs=jobs)
+    finally:
+        stop_timings()
+    phases = timings.phases
+    assert phases['compile'][0] == phases['read'][0] == phases['parse'][0] == 6
+    assert phases['walk'][0] == 4  # The root, pkg0, pkg1, pkg2.
+    assert phases['ignore'][0] > 0
+
+def test_incremental_compile_only_recompiles_changes(temp_folder, monkeypatch):
+    space = _space_with_modules(temp_folder.path, 6)
+    backdate(*[m.path for m in space.modules()])
+    first = Space(space.path).compile()
+    compiled = []
+    real = Module.compile
+    def spy(self):
+        compiled.append(os.path.basename(self.path))
+        return real(self)
+    monkeypatch.setattr(Module, 'compile', spy)
+    second = Space(space.path).compile()
+    assert compiled == []
+    assert [a.code for a in second[0]] == [a.code for a in first[0]]
+    assert second[1] == first[1]
+    with open(os.path.join(temp_folder.path, 'pkg1', 'm1.i'), 'wt') as f:
+        f.write('name: changed\n')
+    third = Space(space.path).compile()
+    assert compiled == ['m1.i']
+    assert any(str(a.get('name')) == 'changed' for a in third[0])
+
+def test_incremental_compile_notices_iignore_changes(temp_folder, monkeypatch):
+    space = _space_with_modules(temp_folder.path, 6)
+    backdate(*[m.path for m in space.modules()])
+    Space(space.path).compile()
+    compiled = []
+    real = Module.compile
+    def spy(self):
+        compiled.append(os.path.relpath(self.path, temp_folder.path))
+        return real(self)
+    monkeypatch.setattr(Module, 'compile', spy)
+    with open(os.path.join(temp_folder.path, 'pkg2', '.iignore'), 'wt') as f:
+        f.write('*.tmp\n')
+    Space(space.path).compile()
+    assert sorted(compiled) == ['pkg2/m2.i', 'pkg2/m5.i']
+
+def _tree(folder):
+    space = Space.init(folder)
+    for rel in ['a.i', 'notes.txt', 'src/b.i', 'src/deep/c.i', 'node_modules/pkg/d.i', 'build/e.i']:
+        path = os.path.join(folder, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wt') as f:
+            f.write('x: 1\n')
+    with open(os.path.join(folder, 'src', '.iignore'), 'wt') as f:
+        f.write('deep/\n')
+    return space
+
+def test_walk_prunes_ignored_folders(temp_folder, monkeypatch):
+    space = _tree(temp_folder.path)
+    scanned = []
+    real = os.scandir
+    monkeypatch.setattr(os, 'scandir', lambda path: scanned.append(path) or real(path))
+    walked = {os.path.relpath(root, space.path): (sorted(dirs), sorted(files)) for root, dirs, files in space.walk()}
+    assert walked == {
+        '.': (['src'], ['.gitignore', '.iignore', 'a.i', 'notes.txt', 'space.i']),
+        'src': ([], ['.iignore', 'b.i']),
+    }
+    assert sorted(os.path.relpath(p, space.path) for p in scanned) == ['.', 'src']
+    assert sorted(m.sid for m in space.modules()) == ['/a', '/space', '/src/b']
+    assert space.should_ignore(os.path.join(space.path, 'node_modules'))
+    assert not space.should_ignore(os.path.join(space.path, 'a.i'))
+
+@pytest.mark.parametrize('threads', [1, 4])
+def test_modules_lists_each_folder_once(temp_folder, monkeypatch, threads):
+    space = _tree(temp_folder.path)
+    listed, checked = [], []
+    real_scandir, real_isfile = os.scandir, os.path.isfile
+    monkeypatch.setattr(os, 'scandir', lambda path: listed.append(threading.current_thread()) or real_scandir(path))
+    monkeypatch.setattr(os.path, 'isfile', lambda path: checked.append(path) or real_isfile(path))
+    assert [m.sid for m in Space(space.path).modules(threads)] == ['/a', '/space', '/src/b']
+    assert len(listed) == 2
+    assert checked == []
+    if threads > 1:
+        assert threading.main_thread() not in listed
+
+def test_walk_include_ignored_entries_and_bottom_up(temp_folder):
+    space = _tree(temp_folder.path)
+    walked = list(space.walk(topdown=False, include_ignored=True, entries=True, match_file=lambda f: f.endswith('.i')))
+    folders = [os.path.relpath(root, space.path) for root, _, _ in walked]
+    assert folders[-1] == '.'
+    assert folders.index(os.path.join('src', 'deep')) < folders.index('src')
+    assert 'out' in folders and os.path.join('node_modules', 'pkg') in folders
+    for root, dirs, files in walked:
+        assert all(isinstance(e, os.DirEntry) and e.is_file() for e in files)
+        assert all(e.is_dir() for e in dirs)
+
+def test_threaded_modules_match_serial_order(temp_folder):
+    space = _tree(temp_folder.path)
+    for rel in ['src/z.i', 'src/a/a.i', 'src/a/b/c.i', 'zz/y.i', 'b.i']:
+        path = os.path.join(temp_folder.path, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wt') as f:
+            f.write('x: 1\n')
+    serial = [m.sid for m in space.modules()]
+    assert serial == ['/a', '/b', '/space', '/src/b', '/src/z', '/src/a/a', '/src/a/b/c', '/zz/y']
+    assert [m.sid for m in Space(space.path).modules(threads=4)] == serial
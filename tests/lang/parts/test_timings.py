@@ -0,0 +1,23 @@
+from intent.lang.parts.timings import Timings, active_timings, start_timings, stop_timings, timed
+
+def test_timed_costs_nothing_when_not_recording():
+    assert active_timings() is None
+    assert timed('parse', len) is len
+
+def test_timed_records_calls_while_recording():
+    timings = start_timings()
+    try:
+        count = timed('parse', len)
+        assert count('abc') == 3 and count('') == 0
+    finally:
+        assert stop_timings() is timings
+    calls, ns = timings.phases['parse']
+    assert calls == 2 and ns >= 0
+    assert timed('parse', len) is len
+
+def test_merge_and_take():
+    timings = Timings()
+    timings.add('read', 5)
+    timings.merge({'read': [2, 10], 'walk': [1, 3]})
+    assert timings.take() == {'read': [3, 15], 'walk': [1, 3]}
+    assert timings.phases == {}
@@ -0,0 +1,88 @@
+import os
+import sys
+import pytest
+
+from intent.lang.parts import Space
+from intent.lang.parts.watch import HotSpace, InotifyWatcher, PollingWatcher
+
+from .util import temp_folder, write
+
+WATCHERS = [PollingWatcher]
+if sys.platform.startswith('linux'):
+    WATCHERS.append(InotifyWatcher)
+
+@pytest.mark.parametrize('cls', WATCHERS)
+def test_watcher_reports_changes(temp_folder, cls):
+    root = temp_folder.path
+    write(os.path.join(root, 'a.i'), 'a: 1\n')
+    write(os.path.join(root, 'skip', 'x.i'), 'x: 1\n')
+    watcher = cls(root, lambda folder: os.path.basename(folder) == 'skip')
+    try:
+        assert watcher.poll() == set()
+        write(os.path.join(root, 'a.i'), 'a: 22\n')
+        write(os.path.join(root, 'sub', 'b.i'), 'b: 1\n')
+        write(os.path.join(root, 'sub', 'notes.txt'), 'hi\n')
+        write(os.path.join(root, 'skip', 'y.i'), 'y: 1\n')
+        assert watcher.poll() == {os.path.join(root, 'a.i'), os.path.join(root, 'sub', 'b.i')}
+        os.remove(os.path.join(root, 'a.i'))
+        assert watcher.poll() == {os.path.join(root, 'a.i')}
+        assert watcher.poll() == set()
+    finally:
+        watcher.close()
+
+@pytest.mark.parametrize('polling', [True, False])
+def test_hot_space_recompiles_only_changes(temp_folder, polling):
+    space = Space.init(temp_folder.path)
+    a = space.rel_path_to_abs('a.i')
+    write(a, 'a: 1\n')
+    hot = HotSpace(space.path, polling)
+    try:
+        assert hot.update() == set()
+        asts, problems = hot.compile()
+        assert len(asts) == 2 and not problems
+        write(a, 'a: b\n\tc: d\n')
+        assert hot.update() == {a}
+        asts, problems = hot.compile()
+        assert len(asts) == 1 and 'a.i' in problems[0]
+        b = space.rel_path_to_abs('sub/b.i')
+        write(b, 'b: 2\n')
+        os.remove(a)
+        asts, problems = hot.compile()
+        assert len(asts) == 2 and not problems
+        assert str(hot.results[b][0]['b']) == '2'
+        write(space.rel_path_to_abs('sub/.iignore'), '*.tmp\n')
+        assert hot.update() is None
+        assert sorted(hot.results) == sorted(m.path for m in space.modules())
+    finally:
+        hot.close()
+
+@pytest.mark.parametrize('polling', [True, False])
+def test_hot_space_respects_iignore(temp_folder, polling):
+    space = Space.init(temp_folder.path)
+    write(space.rel_path_to_abs('.iignore'), 'node_modules/\nout/\n')
+    write(space.rel_path_to_abs('b.i'), 'b: 1\n')
+    write(space.rel_path_to_abs('node_modules/pkg/x.i'), 'x: 1\n')
+    hot = HotSpace(space.path, polling)
+    try:
+        assert hot._skip_dir(space.rel_path_to_abs('node_modules'))
+        write(space.rel_path_to_abs('node_modules/pkg/bad.i'), 'a: b\n\tc: d\n')
+        write(space.rel_path_to_abs('a.i'), 'a: 1\n')
+        asts, problems = hot.compile()
+        assert problems == [] and len(asts) == 3
+        assert list(hot.results) == [m.path for m in Space(space.path).modules()]
+    finally:
+        hot.close()
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='needs inotify')
+def test_hot_space_falls_back_to_polling_when_a_watch_fails(temp_folder):
+    space = Space.init(temp_folder.path)
+    hot = HotSpace(space.path)
+    try:
+        assert isinstance(hot.watcher, InotifyWatcher)
+        hot.watcher._add_watch = lambda *args: -1
+        write(space.rel_path_to_abs('sub/b.i'), 'b: 1\n')
+        assert hot.update() is None
+        assert isinstance(hot.watcher, PollingWatcher)
+        assert space.rel_path_to_abs('sub/b.i') in hot.results
+    finally:
+        hot.close()
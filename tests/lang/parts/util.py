@@ -31,3 +31,21 @@ def temp_folder():
     with TempFolder() as tf:
         yield tf
 
+
+def write(path, text='x: 1\n', age=0):
+    """
+    Write a text file, creating its folder if needed. If age is given, the file's
+    mtime is moved that many seconds into the past (e.g., so it's old enough for
+    a stamp to be trusted).
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wt') as f:
+        f.write(text)
+    if age:
+        backdate(path, age=age)
+
+def backdate(*paths, age=10):
+    """Move the mtime of each path age seconds into the past."""
+    for path in paths:
+        t = os.stat(path).st_mtime - age
+        os.utime(path, (t, t))
@@ -0,0 +1,87 @@
+import datetime
+import io
+
+from intent.lang.serde import load, dump
+
+COMMENTED_DOC = """# leading comment
+a: b # trailing comment
+"quoted\\x3akey" : 'quoted value'
+
+c:  # comment on a key with nested content
+  # above the first item
+  - d
+  - "e"   # spaces before comment
+  -
+    - f
+  - g: h
+    i: j
+  -
+    # above a dict in a bare item
+    k: l
+  -
+  - 
+m:
+  n:
+    o: p
+# tail
+"""
+
+def test_dump_round_trips_comments():
+    assert dump(load(COMMENTED_DOC)) == COMMENTED_DOC
+
+def test_dump_normalizes_line_endings():
+    assert dump(load("a: b\r\nc:\r  - d")) == "a: b\nc:\n  - d\n"
+
+def test_dump_to_file():
+    f = io.StringIO()
+    assert dump(load(COMMENTED_DOC), f) is None
+    assert f.getvalue() == COMMENTED_DOC
+
+def test_code_of_nested_containers_keeps_indent():
+    x = load(COMMENTED_DOC)
+    assert x["m"]["n"].code == "    o: p\n# tail\n"
+    assert x["c"][3].code == "  - g: h\n    i: j\n"
+
+def test_dump_plain_values():
+    data = {
+        "a": "x:y",
+        "b": [1, True, None, 2.5, "1", "-z"],
+        "c": {"d": [{"e": "f", "g": "h"}, ["i"]]},
+        "when": datetime.date(2024, 1, 2),
+    }
+    txt = dump(data)
+    assert txt == (
+        'a: "x\\x3ay"\n'
+        'b:\n'
+        '  - 1\n'
+        '  - true\n'
+        '  - null\n'
+        '  - 2.5\n'
+        '  - "1"\n'
+        '  - "-z"\n'
+        'c:\n'
+        '  d:\n'
+        '    - e: f\n'
+        '      g: h\n'
+        '    -\n'
+        '      - i\n'
+        'when: 2024-01-02\n')
+    x = load(txt)
+    assert x["a"] == "x:y"
+    assert x["c"]["d"] == [{"e": "f", "g": "h"}, ["i"]]
+
+def make_doc(entries: int) -> str:
+    lines = []
+    for i in range(entries):
+        lines.append(f"# comment {i}")
+        lines.append(f"key{i}: value {i} # trailing")
+        lines.append(f"nested{i}:")
+        for j in range(5):
+            lines.append(f"  - item {j}")
+            lines.append(f"  - k{j}: v{j}")
+            lines.append(f"    w{j}: 'quoted {j}'")
+    return "\n".join(lines) + "\n"
+
+def test_dump_large_doc_round_trips():
+    doc = make_doc(500)
+    assert dump(load(doc)) == doc
@@ -1,5 +1,6 @@
+import io
 import pytest
-from intent.lang.serde import load
+from intent.lang.serde import load, load_iter, Dict
 
 def test_load_simple():
     x = load("a: b\nc: d")
@@ -41,3 +42,81 @@ def test_load_list_nested_no_space():
     x = load("a:\n  -\n    - e")
     assert x == {"a": [["e"]]}
 
+def test_load_mixed_line_endings():
+    x = load("a: b\r\nc:\r  - d\n  - e\r\nf: g")
+    assert x == {"a": "b", "c": ["d", "e"], "f": "g"}
+
+def test_line_index():
+    from intent.lang.serde.parse import LineIndex
+    lines = LineIndex("a: b\r\n  c: d\r\n\n# x")
+    assert len(lines) == 4
+    assert list(lines.starts) == [0, 6, 14, 15]
+    assert list(lines.indents) == [0, 8, 14, 15]
+    assert list(lines.ends) == [4, 12, 14, 18]
+    assert lines.start_of(5) == 18
+
+def test_load_trailing_comments():
+    x = load("a: b\n# c\n")
+    assert x[None].above == "# c\n"
+    x = load("a:\n  - d\n# c\n")
+    assert x["a"][-1].above == "# c\n"
+
+DOC_FOR_ITER = """# leading
+a: b
+# before c
+c:
+  - d
+  - e: f
+    g: h
+# after c
+i: j
+# trailing
+"""
+
+def test_load_iter_matches_load():
+    expected = load(DOC_FOR_ITER)
+    actual = Dict(load_iter(io.StringIO(DOC_FOR_ITER)))
+    assert actual == expected
+    assert [k.above for k in actual if k] == [k.above for k in expected if k]
+    assert actual["c"][-1][None].above == "# after c\n"
+    assert actual[None].above == "# trailing\n"
+
+def test_load_iter_is_incremental():
+    consumed = []
+    def lines():
+        for line in io.StringIO(DOC_FOR_ITER):
+            consumed.append(line)
+            yield line
+    it = load_iter(lines())
+    key, value = next(it)
+    assert key == "a" and value == "b"
+    # We had to see the start of the next entry, but nothing more.
+    assert consumed[-1] == "c:\n"
+
+def test_load_iter_list():
+    items = list(load_iter(["- a", "- b: c", "  d: e", "-", "  - f"]))
+    assert items == ["a", {"b": "c", "d": "e"}, ["f"]]
+
+def test_load_iter_error_line_numbers():
+    with pytest.raises(ValueError, match="line 4"):
+        list(load_iter("a: b\nc: d\ne:\n   f: g\n"))
+
+def test_load_deeper_than_recursion_limit():
+    import sys
+    depth = sys.getrecursionlimit() + 100
+    # Dicts and lists alternate, with a comment and a bare bullet along the way.
+    lines = []
+    for level in range(depth):
+        indent = '  ' * level
+        lines.append(f'{indent}# at {level}\n{indent}-\n' if level % 2 else f'{indent}k{level}:\n')
+    doc = ''.join(lines) + '  ' * depth + 'leaf: 1\n'
+    x = load(doc)
+    assert x.code == doc
+    for level in range(depth):
+        x = x[0] if level % 2 else x[f'k{level}']
+    assert x == {'leaf': '1'}
+
+def test_error_deep_inside_nesting():
+    doc = ''.join('  ' * level + f'k{level}:\n' for level in range(50)) + '  ' * 50 + 'no colon\n'
+    with pytest.raises(ValueError, match="No key: value on line 51"):
+        load(doc)
@@ -1,4 +1,5 @@
 import pytest
+from intent.lang.serde import load
 from intent.lang.serde.pieces import *
 
 def test_chunk_preconditions():
@@ -158,4 +159,54 @@ def test_commented_list_as_str():
     assert str(LIST_WITH_MID_COMMENT) == '[a, def, , content, indented content]'
 
 def test_commented_list_as_text():
-    assert List(LIST_WITH_MID_COMMENT).code == "a\n'def' #comment\n#pure comment\ncontent\n  indented content\n"
\ No newline at end of file
+    assert List(LIST_WITH_MID_COMMENT).code == "a\n'def' #comment\n#pure comment\ncontent\n  indented content\n"
+
+def test_chunk_is_slotted():
+    cv = Chunk.from_listvalue("  a # b")
+    assert not hasattr(cv, "__dict__")
+
+def test_chunk_from_source_does_not_copy():
+    src = "x: 'y\\n'  # z\n"
+    value = Chunk.from_source_value(Chunk.Mode.DICT_VALUE, src, 2, len(src) - 1)
+    assert value._src is src
+    assert (value.pre, value.chunk, value.divider, value.post) == (" '", "y\\n", "'  ", "# z")
+    assert value.interpreted_chunk == "y\n"
+    # Assigning a part switches to plain strings without disturbing the others.
+    value.post = "# changed"
+    assert value._src is None
+    assert value.code == " 'y\\n'  # changed"
+
+def test_chunk_interprets_lazily():
+    cv = Chunk.from_listvalue('"plain"')
+    assert cv._interpreted is None
+    assert cv.interpreted_chunk == "plain"
+
+def test_chunk_with_bad_escape_fails_at_parse():
+    with pytest.raises(ValueError, match="escape"):
+        Chunk.from_listvalue('"bad \\x4"')
+    with pytest.raises(ValueError, match="escape"):
+        load('a: "bad \\q"\n')
+
+def test_chunk_above_from_text_span():
+    src = "# a\r\n\r\n# b\r\nk: v"
+    key = Chunk.from_source_key(src, 12, 14, above=TextSpan(src, 0, 10))
+    assert key.above == "# a\n\n# b\n"
+    assert key.code == "# a\n\n# b\nk:"
+
+def test_decode_quoted():
+    assert decode_quoted("plain", '"') == "plain"
+    assert decode_quoted("a\\x3ab\\x23c", '"') == "a:b#c"
+    assert decode_quoted("\\n\\t\\\\\\'\\\"", "'") == "\n\t\\'\""
+    assert decode_quoted("\\u00e9\\U0001F600\\N{BULLET}\\101", '"') == "é😀•A"
+    for bad, msg in [("a\\qb", "invalid escape sequence '\\\\q'"), ("\\x4", "truncated"),
+                     ("\\N{NOT A NAME}", "unknown Unicode"), ('a"b', "Unescaped"), ("a\\", "unterminated")]:
+        with pytest.raises(ValueError, match=msg):
+            decode_quoted(bad, '"')
+    # The error for an invalid escape is worded the way INVALID_ESC_SEQ_PAT expects.
+    with pytest.raises(ValueError) as e:
+        decode_quoted("\\q", '"')
+    assert INVALID_ESC_SEQ_PAT.fullmatch(str(e.value))
+
+def test_decode_quoted_agrees_with_literal_eval():
+    samples = [f"value {i}" for i in range(200)] + [f"key\\x3a {i}\\n\\u00e9" for i in range(200)]
+    assert [decode_quoted(s, '"') for s in samples] == [safe_literal_eval('"' + s + '"') for s in samples]
@@ -1,4 +1,5 @@
 import datetime
+import dateutil.parser
 import pytest
 import random
 
@@ -77,3 +78,67 @@ def test_date():
         with pytest.raises(ValueError):
             deserialize_date(value)
 
+
+def test_classify_and_deserialize_agrees_with_checks():
+    samples = ["~", "null", "NULL", "nULL", "true", "tRUE", "On", "NO", "nO", "0", "-1", "+0x1f",
+               "-0x1F", "0b101", "0o17", "0o8", "1_000", "1__0", "_1", "1_", "3.14", "3.", "-.5",
+               ".5e3", "1e308", "1e309", ".inf", "-.inf", ".nan", "-.nan", ".infinity", "2000",
+               "2000-02-29", "2000-02-30", "2024-12-10T11:14:53.29348", "0000-01-01", "20000229",
+               "0x", "-", ".", "e5", "abc", "", "1" * 40 + "x"]
+    for txt in samples:
+        kind, value = classify_and_deserialize(txt)
+        if is_null(txt):
+            assert (kind, value) == (NULL, None)
+        elif is_bool(txt):
+            assert (kind, value) == (BOOL, deserialize_bool(txt))
+        elif is_int(txt):
+            assert (kind, value) == (INT, deserialize_int(txt))
+        elif is_float(txt):
+            assert kind == FLOAT
+            assert str(value) == str(deserialize_float(txt))
+        elif is_date(txt):
+            assert (kind, value) == (DATE, deserialize_date(txt))
+        else:
+            assert (kind, value) == (STR, txt)
+
+def test_signed_prefixed_ints():
+    assert deserialize_int("-0x1f") == -31
+    assert deserialize_int("+0b101") == 5
+    assert deserialize_int("-0o17") == -15
+    assert not is_int("0o8")
+
+def test_common_dates_skip_dateutil(monkeypatch):
+    def fail(txt):
+        raise AssertionError(f"dateutil called for {txt}")
+    monkeypatch.setattr(dateutil.parser, "isoparse", fail)
+    utc = datetime.timezone.utc
+    for txt, value in [
+        ("2000-02-29", datetime.datetime(2000, 2, 29)),
+        ("2024-12-10T11:14:53.29348", datetime.datetime(2024, 12, 10, 11, 14, 53, 293480)),
+        ("2024-10-18T19:05:00Z", datetime.datetime(2024, 10, 18, 19, 5, tzinfo=utc)),
+        ("2024-10-18 19:05+05:30", datetime.datetime(2024, 10, 18, 13, 35, tzinfo=utc)),
+        ]:
+        assert deserialize_date(txt) == value
+    for txt in ["hello", "12 apples", "2024 budget", "2000+229T1000", "3.5", ""]:
+        assert not is_date(txt)
+
+def test_exotic_dates_use_dateutil():
+    for txt, value in [
+        ("20000229T1000", datetime.datetime(2000, 2, 29, 10)),
+        ("2000-W01-1", datetime.datetime(2000, 1, 3)),
+        ("2000060", datetime.datetime(2000, 2, 29)),
+        ("2000-02-29T24:00", datetime.datetime(2000, 3, 1)),
+        ]:
+        assert deserialize_date(txt) == value
+        if not is_int(txt):
+            assert classify_and_deserialize(txt) == (DATE, value)
+
+def test_timestamp_tag():
+    txt = "!!timestamp 2024-10-18T19:05:00Z"
+    value = datetime.datetime(2024, 10, 18, 19, 5, tzinfo=datetime.timezone.utc)
+    assert is_date(txt)
+    assert deserialize_date(txt) == value
+    assert classify_and_deserialize(txt) == (DATE, value)
+    assert classify_and_deserialize("!!timestamp soon") == (STR, "!!timestamp soon")
+    with pytest.raises(ValueError):
+        deserialize_date("!!timestamp soon")
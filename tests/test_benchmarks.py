@@ -0,0 +1,39 @@
+import json
+import os
+
+import pytest
+
+from benchmarks import fs, serde
+from intent.lang.serde import load
+
+from .lang.parts.util import temp_folder
+
+@pytest.mark.parametrize('name', list(serde.DOCUMENTS))
+def test_serde_documents_round_trip(name):
+    generate, _ = serde.DOCUMENTS[name]
+    doc = generate(7)
+    assert load(doc).code == doc
+    assert serde.make_chunks(doc.splitlines(keepends=True)) > 0
+
+def test_serde_results_saved_as_json(temp_folder, capsys):
+    out = os.path.join(temp_folder.path, 'results.json')
+    serde.main(['--scale', '0.001', '--repeat', '1', '--out', out])
+    serde.main(['--scale', '0.001', '--repeat', '1', '--only', 'wide', '--compare', out])
+    with open(out) as f:
+        results = json.load(f)['results']
+    assert sorted(results) == sorted(serde.DOCUMENTS)
+    assert results['deep']['load_peak_kib'] > 0
+    assert 'x)' in capsys.readouterr().out.splitlines()[-1]
+
+def test_fs_benchmark_counts_work_on_a_small_space(temp_folder):
+    fs.build_space(temp_folder.path, packages=2, files=3, fanout=4, depth=3)
+    try:
+        results = fs.bench(temp_folder.path, repeat=1)
+    finally:
+        fs.cold()
+    # 3 modules plus a deep leaf per package, plus space.i.
+    assert results['modules']['items'] == results['modules_snapshot']['items'] == 9
+    # The root, and each package and its 3 nested folders; ignored folders aren't listed.
+    assert results['modules']['by_call']['scandir'] == 9
+    assert 'scandir' not in results['modules_snapshot']['by_call']
+    assert results['canonical_path_warm']['syscalls'] == 0